@@ -0,0 +1,179 @@
+"""
+Benchmarks for the lottery hot paths.
+
+    python benchmarks/run_benchmarks.py                 # full sweep, compare to baseline
+    python benchmarks/run_benchmarks.py --quick         # small sweep
+    python benchmarks/run_benchmarks.py --save-baseline # overwrite benchmarks/baseline.json
+
+Every case reports the best wall time over --repeat rounds, throughput in
+its own unit, and peak traced memory (measured in a separate, untimed
+round). A case is flagged as a regression when its best time is more than
+--tolerance slower than the stored baseline; the exit code is 1 then.
+Baselines are machine-specific: re-save them when the hardware changes.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lottery_engine as le  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+TEAM_COUNTS = [2, 4, 8, 14, 20, 30]
+RUN_COUNTS = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_TEAM_COUNTS = [4, 14, 30]
+QUICK_RUN_COUNTS = [1_000, 100_000]
+
+
+def league(n_teams):
+    """n_teams with descending tickets summing to LOTTERY_TICKETS."""
+    raw = np.arange(n_teams, 0, -1, dtype=float)
+    tickets = np.maximum(1, np.floor(raw / raw.sum() * le.LOTTERY_TICKETS)).astype(int)
+    tickets[0] += le.LOTTERY_TICKETS - tickets.sum()
+    return {f"Team {i + 1}": int(t) for i, t in enumerate(tickets)}
+
+
+def measure(fn, repeat, min_time=0.2):
+    """Best seconds per call over `repeat` rounds (each round loops until min_time) and peak KiB."""
+    fn()  # warm-up: lazy imports, caches
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 10
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start) / loops)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024
+
+
+def cases(quick):
+    """(name, callable, work units per call, unit) for every benchmark."""
+    yield "generate_all_combinations", le.generate_all_combinations, le.COMBO_COUNT, "combos/s"
+
+    teams14 = league(14)
+    yield ("assign_combinations_to_teams[14]", lambda: le.assign_combinations_to_teams(teams14, seed=1),
+           le.LOTTERY_TICKETS, "tickets/s")
+
+    for n_teams in (QUICK_TEAM_COUNTS if quick else TEAM_COUNTS):
+        teams = league(n_teams)
+        for runs in (QUICK_RUN_COUNTS if quick else RUN_COUNTS):
+            yield (f"simulate_lotteries[teams={n_teams},runs={runs}]",
+                   lambda teams=teams, runs=runs: le.simulate_lotteries(teams, runs, seed=1),
+                   runs, "runs/s")
+
+    for n_teams in (QUICK_TEAM_COUNTS if quick else TEAM_COUNTS):
+        teams = league(n_teams)
+        yield (f"simulate_lotteries_rb[teams={n_teams},runs=10000]",
+               lambda teams=teams: le.simulate_lotteries(teams, 10_000, seed=1, estimator="rao_blackwell"),
+               10_000, "runs/s")
+
+    top4 = le.LotteryFormat(lottery_picks=4)
+    for n_teams in (QUICK_TEAM_COUNTS if quick else TEAM_COUNTS):
+        teams = league(n_teams)
+        yield (f"simulate_lotteries_top4[teams={n_teams},runs=100000]",
+               lambda teams=teams: le.simulate_lotteries(teams, 100_000, seed=1, fmt=top4),
+               100_000, "runs/s")
+
+    assignment = le.assign_combinations_to_teams(teams14, seed=1)
+    live = le.LiveLottery(assignment, teams14)
+    draws = [le.combo_unrank(r) for r in range(le.COMBO_COUNT)]
+
+    def manual_lookup():
+        for balls in draws:
+            live.is_live(live.team_id(le.combo_rank(balls)))
+
+    yield "manual_lookup[14]", manual_lookup, len(draws), "lookups/s"
+
+    first_rank = [assignment.rank(team_id, 0) for team_id in range(len(teams14))]
+
+    def full_removal():
+        state = le.LiveLottery(assignment, teams14)
+        for team_id, rank in enumerate(first_rank):
+            state.award(rank, team_id)
+
+    yield "pick_removal[14]", full_removal, len(teams14), "picks/s"
+
+    order = list(league(30))
+    yield "generate_draft_pdf[30]", lambda: le.generate_draft_pdf(order), 1, "pdfs/s"
+
+
+def run(quick, repeat):
+    results = {}
+    for name, fn, units, unit in cases(quick):
+        seconds, peak_kib = measure(fn, repeat)
+        results[name] = {"seconds": seconds, "throughput": units / seconds, "unit": unit,
+                         "peak_kib": round(peak_kib, 1)}
+        print(f"{name:<48} {seconds * 1000:>10.3f} ms  {units / seconds:>14,.0f} {unit:<10} "
+              f"peak {peak_kib:>10,.1f} KiB", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Names of cases more than `tolerance` slower than the baseline."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = res["seconds"] / base["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            print(f"REGRESSION {name}: {ratio:.2f}x the baseline time")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="small team/run sweep")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.repeat)
+    report = {
+        "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline stored yet; run with --save-baseline.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    return 1 if compare(results, baseline, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
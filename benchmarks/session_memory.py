@@ -0,0 +1,118 @@
+"""
+Per-session memory of the Streamlit app.
+
+    python benchmarks/session_memory.py               # 14 teams, 4-of-14 pool
+    python benchmarks/session_memory.py --teams 30 --balls 40 --drawn 5
+
+Drives one session through a whole ceremony (apply teams, compute odds,
+draw every pick) with Streamlit's AppTest and reports the deep size of
+every session_state entry: what each concurrent ceremony keeps on the
+server between reruns. NumPy arrays count their buffers and DataFrames
+their deep memory usage; objects shared by every session (the odds cache,
+the job scheduler, cached PDFs) are not part of session_state and are not
+counted.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "fantasylottery(EN).py")
+sys.path.insert(0, ROOT)
+
+_SKIP = (type, type(sys), type(len))
+
+
+def deep_size(obj, seen=None):
+    """Bytes reachable from obj, counting shared objects once."""
+    import pandas as pd
+
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, _SKIP) or callable(obj) and not hasattr(obj, "__dict__"):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj)  # includes the buffer when the array owns it
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(obj, np.random.Generator):
+        return sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(x, seen) for x in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def ceremony(n_teams, balls, drawn):
+    """AppTest of one session after a full ceremony."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    [n for n in at.number_input if n.label == "Number of teams"][0].set_value(n_teams)
+    at.number_input(key="pool_balls").set_value(balls).run()
+    at.number_input(key="pool_drawn").set_value(drawn).run()
+    raw = np.arange(n_teams, 0, -1)
+    total = min(1000, math.comb(balls, drawn))
+    tickets = np.maximum(1, raw * total // raw.sum())
+    for i, t in enumerate(tickets):
+        at.text_input(key=f"name_{i}").set_value(f"Team {i + 1}")
+        at.number_input(key=f"tickets_{i}").set_value(int(t))
+    at.run()
+    _click(at, "Apply team list")
+    _click(at, "🔁 Run simulation")
+    for _ in range(600):
+        if at.session_state["odds_job"] is None:
+            break
+        time.sleep(0.1)
+        at.run()
+    _click(at, "🔥 Start the lottery show")
+    [r for r in at.radio if "🎲 Auto Generate" in r.options][0].set_value("🎲 Auto Generate").run()
+    for _ in range(n_teams):
+        buttons = [b for b in at.button if b.label.startswith("🔀")]
+        if not buttons:
+            break
+        buttons[0].click().run()
+    if at.exception:
+        raise RuntimeError(at.exception)
+    return at
+
+
+def _click(at, label):
+    [b for b in at.button if b.label == label][0].click().run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, default=14)
+    parser.add_argument("--balls", type=int, default=14)
+    parser.add_argument("--drawn", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("FANTASY_LOTTERY_CACHE_DIR", tempfile.mkdtemp(prefix="lottery_bench_"))
+    at = ceremony(args.teams, args.balls, args.drawn)
+    state = at.session_state._state.filtered_state
+    seen = set()
+    sizes = sorted(((deep_size(value, seen), key) for key, value in state.items()), reverse=True)
+    for size, key in sizes:
+        if size >= 256:
+            print(f"{key:<32} {size / 1024:>10,.1f} KiB")
+    print(f"{'total per session':<32} {sum(s for s, _ in sizes) / 1024:>10,.1f} KiB "
+          f"({len(state)} entries, drafted {len(state.get('draft_order', []))} picks)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
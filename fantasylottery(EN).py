@@ -1,13 +1,18 @@
 # fantasy_lottery_two_tabs.py
 import streamlit as st
 import pandas as pd
-import itertools
-import random
+import math
 import time
+import io
 import os
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+import uuid
+import zipfile
+from lottery_engine import (
+    conditional_odds, choose_odds_engine, default_workers, OddsCache, default_cache_dir,
+    assign_combinations_to_teams, assignment_frame, iter_assignment_csv, combo_rank, LiveLottery,
+    BALLS, DRAWN, solve_tickets, tickets_by_seed, JobScheduler, new_seed, make_rng, derive_seed,
+    generate_draft_pdf, LotteryFormat, League, Metrics, metrics, CeremonyReport, write_reports,
+)
 
 st.set_page_config(page_title="Fantasy Draft Lottery Tool", page_icon="🎲", layout="wide")
 
@@ -15,125 +20,106 @@ st.set_page_config(page_title="Fantasy Draft Lottery Tool", page_icon="🎲", la
 # Helper functions
 # -----------------------
 
-def generate_all_combinations():
-    """Generate all 4-number combinations from 1–14."""
-    numbers = list(range(1, 15))
-    return [" ".join(map(str, sorted(c))) for c in itertools.combinations(numbers, 4)]
+ENGINE_LABELS = {"exact": "exact", "monte_carlo": "Monte-Carlo", "rao_blackwell": "Monte-Carlo, conditional odds"}
+
+
+@st.cache_resource
+def get_odds_cache():
+    """Process-wide odds cache shared by all sessions."""
+    return OddsCache(default_cache_dir())
+
+
+@st.cache_resource
+def get_live_odds_cache():
+    """Memory-only odds cache of ceremony states: kept apart from the Setup tab's cache and never written to disk."""
+    return OddsCache(None, max_entries=512)
+
+
+@st.cache_resource
+def start_metrics_server():
+    """Serve the process metrics for scraping when FANTASY_LOTTERY_METRICS_PORT is set (once per process)."""
+    port = os.environ.get("FANTASY_LOTTERY_METRICS_PORT")
+    return metrics.serve(int(port)) if port else None
+
+
+@st.cache_resource
+def get_job_scheduler():
+    """Process-wide pool for odds jobs: identical requests from any session share one computation."""
+    return JobScheduler(cache=get_odds_cache())
+
+
+def start_live_lottery():
+    """Fresh ceremony state for the current teams and format (picks that go by seed up front are given)."""
+    teams = st.session_state.teams
+    st.session_state.live = LiveLottery(st.session_state.assignment, teams, teams.format)
+    st.session_state.draft_order = []
+    give_seeded_picks()
+
+
+def session_memo(name, key, build):
+    """build() kept in session state until `key` changes (objects compare by identity)."""
+    cached = st.session_state.get(f"memo_{name}")
+    if cached is None or not (cached[0] is key or (isinstance(key, tuple) and cached[0] == key)):
+        cached = (key, build())
+        st.session_state[f"memo_{name}"] = cached
+    return cached[1]
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def draft_pdf_bytes(draft_order):
+    """Draft order PDF, built once per draft_order tuple."""
+    return generate_draft_pdf(list(draft_order)).getvalue()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def ceremony_report_files(key, _report):
+    """(report PDF, ZIP with the PDF and CSV bundle) of a ceremony, built once per report key by write_reports."""
+    buf = io.BytesIO()
+    names = write_reports([_report], buf, cache=get_live_odds_cache())
+    with zipfile.ZipFile(buf) as archive:
+        pdf = archive.read(next(name for name in names if name.endswith(".pdf")))
+    return pdf, buf.getvalue()
+
+
+def give_seeded_picks():
+    """Award the upcoming picks that are not drawn (protected, max drop, past the lottery); returns messages."""
+    live = st.session_state.live
+    if live is None:
+        return []
+    given = live.advance()
+    for _, team_id in given:
+        st.session_state.draft_order.append(live.teams[team_id])
+    return [f"📌 {live.teams[team_id]} gets Pick {pick} by seed." for pick, team_id in given]
 
 
-def assign_combinations_to_teams(teams_dict, seed=None):
-    """
-    Assign ALL 1000 unique combinations to teams according to their ticket share.
-    Ensures that each team gets exactly 'tickets' combos, totaling 1000.
-    """
-    if seed is not None:
-        random.seed(seed)
-
-    all_combos = generate_all_combinations()  # 1001 total combos possible
-    total_tickets = sum(teams_dict.values())
-
-    if total_tickets != 1000:
-        raise ValueError("Total tickets must equal 1000!")
-
-    if total_tickets > len(all_combos):
-        raise ValueError("Not enough unique 4-number combinations available!")
-
-    random.shuffle(all_combos)
-
-    assignments = []
-    combo_index = 0
-    for team, tickets in teams_dict.items():
-        for _ in range(tickets):
-            combo = all_combos[combo_index]
-            assignments.append({"Combination": combo, "Team": team})
-            combo_index += 1
-
-    df = pd.DataFrame(assignments)
-    return df
-
-
-def simulate_lotteries(teams_dict, n_simulations=10000, seed=None):
-    """Monte Carlo simulation to estimate draft odds for each pick."""
-    if seed is not None:
-        random.seed(seed)
-
-    teams = list(teams_dict.keys())
-    max_picks = len(teams)
-    counts = {team: {pick: 0 for pick in range(1, max_picks + 1)} for team in teams}
-    all_combos_master = generate_all_combinations()
-
-    for sim in range(n_simulations):
-        combos = all_combos_master.copy()
-        random.shuffle(combos)
-        combos = combos[:1000]
-        assignments = []
-        i = 0
-        for team, n in teams_dict.items():
-            block = combos[i:i + n]
-            for c in block:
-                assignments.append((c, team))
-            i += n
-        combo_to_team = dict(assignments)
-        remaining_combos = list(combo_to_team.keys())
-
-        for pick in range(1, max_picks + 1):
-            choice = random.choice(remaining_combos)
-            team = combo_to_team[choice]
-            counts[team][pick] += 1
-            remaining_combos = [c for c in remaining_combos if combo_to_team[c] != team]
-
-    percents = {}
-    for team in teams:
-        percents[team] = {}
-        for pick in range(1, max_picks + 1):
-            percents[team][pick] = round(counts[team][pick] / n_simulations * 100, 4)
-
-    df = pd.DataFrame.from_dict({team: percents[team] for team in teams}, orient="index")
-    df.columns = [f"Pick {c}" for c in df.columns]
-    return percents, df
-
-
-def generate_draft_pdf(draft_order):
-    buf = BytesIO()
-    p = canvas.Canvas(buf, pagesize=A4)
-    w, h = A4
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, h - 50, "Fantasy Draft Lottery - Draft Order")
-    p.setFont("Helvetica", 12)
-    y = h - 80
-    for i, team in enumerate(draft_order, start=1):
-        p.drawString(50, y, f"{i}. {team}")
-        y -= 18
-        if y < 50:
-            p.showPage()
-            p.setFont("Helvetica", 12)
-            y = h - 50
-    p.save()
-    buf.seek(0)
-    return buf
 # -----------------------
 # Session state defaults
 # -----------------------
 if "teams" not in st.session_state:
-    st.session_state.teams = {}
+    st.session_state.teams = League()  # applied teams: tickets, seeds and lottery format
 
-if "assignment_df" not in st.session_state:
-    st.session_state.assignment_df = pd.DataFrame(columns=["Combination", "Team"])
+if "assignment" not in st.session_state:
+    st.session_state.assignment = None  # ComboAssignment: team id per combination rank
 
 if "draft_order" not in st.session_state:
     st.session_state.draft_order = []
 
-if "drawn_combos" not in st.session_state:
-    st.session_state.drawn_combos = []
+if "live" not in st.session_state:
+    st.session_state.live = None  # LiveLottery of the running ceremony
 
-if "remaining_df" not in st.session_state:
-    st.session_state.remaining_df = st.session_state.assignment_df.copy()
+if "odds" not in st.session_state:
+    st.session_state.odds = None  # OddsTable of the last odds run (tables are built only to be shown)
 
-if "simulated_odds" not in st.session_state:
-    st.session_state.simulated_odds = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # owner of this browser session's odds jobs
 
-if "simulated_odds_df" not in st.session_state:
-    st.session_state.simulated_odds_df = None
+if "rng" not in st.session_state:
+    # every random choice of this session (assignment, auto draws, commentary) comes from this stream
+    st.session_state.rng_seed = new_seed()
+    st.session_state.rng = make_rng(st.session_state.rng_seed)
+
+if "odds_job" not in st.session_state:
+    st.session_state.odds_job = None  # id of the running background odds job
 
 if "reset_inputs" not in st.session_state:
     st.session_state.reset_inputs = False
@@ -143,6 +129,15 @@ if "league_name" not in st.session_state:
 
 if "draft_year" not in st.session_state:
     st.session_state.draft_year = 2025
+
+if "metrics" not in st.session_state:
+    st.session_state.metrics = Metrics()  # this session's timings, shown in the Performance panel
+
+# time the whole run and record engine timings into this session as well as the process
+rerun_started = time.perf_counter()
+metrics.bind(st.session_state.metrics)
+start_metrics_server()
+
 # -----------------------
 # UI: two tabs
 # -----------------------
@@ -165,7 +160,27 @@ with tab1:
     with col_league[0]:
         league_name = st.text_input("League name", key="league_name")
         year = st.number_input("Year", min_value=2000, max_value=2100, step=1, key="league_year")
-    st.info("Enter the number of teams in your league, team names and ticket counts. Total tickets must sum to 1000.")
+    pool_cols = st.columns([1, 1, 2])
+    pool_balls = pool_cols[0].number_input("Balls in the machine", min_value=5, max_value=60, step=1, value=BALLS,
+                                           key="pool_balls")
+    pool_drawn = pool_cols[1].number_input("Balls drawn", min_value=1, max_value=min(8, int(pool_balls) - 1), step=1,
+                                           value=min(DRAWN, int(pool_balls) - 1), key="pool_drawn")
+    pool_size = math.comb(int(pool_balls), int(pool_drawn))
+    pool_cols[2].metric("Possible combinations", f"{pool_size:,}")
+    with st.expander("🏀 Lottery format (NBA style: top picks drawn, the rest by seed)"):
+        format_cols = st.columns(3)
+        format_picks = format_cols[0].number_input("Picks drawn by lottery (0 = all)", min_value=0, max_value=30,
+                                                   step=1, value=0, key="format_picks")
+        format_drop = format_cols[1].number_input("Max drop below seed (0 = no limit)", min_value=0, max_value=29,
+                                                  step=1, value=0, key="format_drop")
+        format_protected = format_cols[2].multiselect("Protected seeds (keep their pick)", list(range(1, 31)),
+                                                      key="format_protected")
+        st.caption("Picks after the lottery picks go to the remaining teams by seed (most tickets first). "
+                   "Applies with 'Apply team list'.")
+    st.info(
+        f"Enter the number of teams in your league, team names and ticket counts. Total tickets can be at most "
+        f"{pool_size:,}; combinations left unassigned are redrawn if they come up (the NBA uses 1000 of 1001)."
+    )
     colA, colB = st.columns([2, 1])
     with colA:
         n = st.number_input(
@@ -215,69 +230,202 @@ with tab1:
                 st.error("Please provide at least two teams with names.")
             else:
                 total = sum(new_teams.values())
-                if total != 1000:
-                    st.error(f"Total tickets = {total}. Please adjust so the sum is exactly 1000.")
+                if total > pool_size:
+                    st.error(f"Total tickets = {total}. Please adjust so the sum is at most {pool_size:,}.")
                 else:
-                    st.session_state.teams = new_teams
-                    st.session_state.assignment_df = assign_combinations_to_teams(st.session_state.teams)
-                    st.session_state.remaining_df = st.session_state.assignment_df.copy()
-                    st.session_state.draft_order = []
-                    st.session_state.drawn_combos = []
-                    st.success("Teams applied and 1000 combinations assigned.")
+                    st.session_state.teams = League(new_teams, LotteryFormat(
+                        int(format_picks) or None, int(format_drop) or None, format_protected))
+                    st.session_state.assignment = assign_combinations_to_teams(
+                        st.session_state.teams, seed=derive_seed(st.session_state.rng),
+                        balls=int(pool_balls), drawn=int(pool_drawn))
+                    start_live_lottery()
+                    st.success(f"Teams applied and {total:,} of {pool_size:,} combinations assigned "
+                               f"({pool_size - total:,} unassigned). Format: "
+                               f"{st.session_state.teams.format.describe()}.")
                     # Tabelle sofort anzeigen
                     st.table(pd.DataFrame({"Team": list(new_teams.keys()), "Tickets": list(new_teams.values())}))
 
         if st.button("Clear teams and assignments"):
-            st.session_state.teams = {}
-            st.session_state.assignment_df = pd.DataFrame(columns=["Combination", "Team"])
-            st.session_state.remaining_df = st.session_state.assignment_df.copy()
+            st.session_state.teams = League()
+            st.session_state.assignment = None
+            st.session_state.live = None
             st.session_state.draft_order = []
-            st.session_state.drawn_combos = []
             st.success("Cleared.")
 
+    with st.expander("🎛️ Ticket designer: suggest tickets for target odds"):
+        st.write(
+            "Set the odds you want and get the flattest ticket table that meets them, summing to the pool size. "
+            "Teams are seeded by the tickets entered above (most tickets = seed 1)."
+        )
+        design_cols = st.columns(4)
+        design_pick1 = design_cols[0].number_input("Seed 1 odds for pick 1 (%) at least", min_value=0.0,
+                                                   max_value=100.0, value=14.0, step=0.5)
+        design_drop = design_cols[1].number_input("No team drops more than (spots)", min_value=0,
+                                                  max_value=max(0, int(n) - 1), value=min(4, int(n) - 1), step=1)
+        design_drop_prob = design_cols[2].number_input("Allowed chance of a bigger drop (%)", min_value=0.0,
+                                                       max_value=100.0, value=5.0, step=0.5)
+        design_total = design_cols[3].number_input("Tickets to hand out", min_value=min(int(n), pool_size),
+                                                   max_value=pool_size, value=pool_size, step=1)
+        if st.button("Suggest tickets"):
+            start = time.time()
+            tickets, probs, info = solve_tickets(int(n), int(design_total), worst_pick1=design_pick1 / 100,
+                                                 max_drop=int(design_drop), max_drop_prob=design_drop_prob / 100)
+            st.session_state.ticket_design = (tickets_by_seed(dict(enumerate(temp_tickets)), tickets), info,
+                                              time.time() - start)
+        if st.session_state.get("ticket_design") is not None:
+            suggested, info, took = st.session_state.ticket_design
+            if len(suggested) != int(n):
+                st.session_state.ticket_design = None
+            else:
+                if info["feasible"]:
+                    st.success(f"Targets met: seed 1 gets {info['worst_pick1'] * 100:.1f}% for pick 1, the worst "
+                               f"drop risk is {info['max_drop_prob'] * 100:.2f}% (found in {took:.2f}s).")
+                else:
+                    st.warning(f"No ticket table meets every target; closest found: seed 1 {info['worst_pick1'] * 100:.1f}% "
+                               f"for pick 1, drop risk {info['max_drop_prob'] * 100:.2f}%. Try a looser drop target.")
+                st.table(pd.DataFrame({"Team": [temp_names[i] or f"Team #{i + 1}" for i in range(int(n))],
+                                       "Current": temp_tickets,
+                                       "Suggested": [suggested[i] for i in range(int(n))]}))
+
+                def _apply_design(suggested=suggested):
+                    for i, t in suggested.items():
+                        st.session_state[f"tickets_{i}"] = t
+
+                st.button("Apply suggested tickets", on_click=_apply_design,
+                          help="Fills the ticket inputs above; click 'Apply team list' afterwards.")
+
     st.markdown("---")
     st.header("2) Assigned combinations")
     st.write("You can download the CSV with all teams and their assigned combinations.")
-    if not st.session_state.assignment_df.empty:
-        csv_bytes = st.session_state.assignment_df.to_csv(index=False).encode("utf-8")
-        st.download_button("Download initial assignment CSV", data=csv_bytes, file_name="assignment.csv", mime="text/csv")
-        st.dataframe(st.session_state.assignment_df.sample(min(50, len(st.session_state.assignment_df))))
+    if st.session_state.assignment is not None:
+        assignment, teams = st.session_state.assignment, st.session_state.teams
+        # built on click, on the download thread: large pools are megabytes of CSV
+        st.download_button("Download initial assignment CSV", file_name="assignment.csv", mime="text/csv",
+                           data=lambda: "".join(iter_assignment_csv(assignment, teams)).encode("utf-8"))
+        st.dataframe(session_memo("assignment_preview", assignment,
+                                  lambda: assignment_frame(assignment, teams, limit=50)))
     else:
         st.write("No assignments yet. Define teams and click 'Apply team list' above.")
 
     st.markdown("---")
-    st.header("3) Monte-Carlo simulation of lottery odds")
-    st.write("Run a Monte-Carlo simulation (10,000 runs) to estimate the probability for each team to land each pick.")
+    st.header("3) Lottery odds (exact or Monte-Carlo)")
+    st.write(
+        "Compute the probability for each team to land each pick. Small leagues get exact odds; "
+        "larger ones fall back to a Monte-Carlo simulation with the number of runs below."
+    )
     sim_col1, sim_col2 = st.columns([2,1])
     with sim_col2:
-        runs = st.number_input("Simulations to run", min_value=1000, max_value=200000, step=1000, value=10000)
+        n_applied = max(1, len(st.session_state.teams))
+        odds_picks = st.number_input("Picks to compute", min_value=1, max_value=n_applied, step=1, value=n_applied)
+        engine = choose_odds_engine(len(st.session_state.teams), int(odds_picks), st.session_state.teams.format)
+        if engine != "exact":
+            estimator = st.radio(
+                "Monte-Carlo estimator", ["Hit counting", "Conditional odds (Rao-Blackwell)"], horizontal=True,
+                help="Conditional odds score every team's exact chance at each simulated pick instead of a 0/1 hit: "
+                     "the first picks need far fewer runs for the same ± (the last pick gains nothing).",
+            )
+            if estimator.startswith("Conditional"):
+                engine = "rao_blackwell"
+        st.caption(f"Engine: **{ENGINE_LABELS[engine]}**")
+        parallel = st.checkbox("Parallel mode (all CPU cores)", value=False, disabled=(engine == "exact"))
+        workers = default_workers() if parallel else 1
+        runs = st.number_input("Simulations to run", min_value=1000, max_value=100_000_000,
+                               step=1000, value=10000, disabled=(engine == "exact"))
+        precision = st.number_input("Stop early at precision (± percentage points, 0 = run all)", min_value=0.0,
+                                    max_value=5.0, step=0.01, value=0.05, format="%.3f",
+                                    disabled=(engine == "exact"))
         if st.button("🔁 Run simulation"):
-            if not st.session_state.teams or st.session_state.assignment_df.empty:
+            if not st.session_state.teams or st.session_state.assignment is None:
                 st.error("Please apply teams first.")
             else:
-                with st.spinner("Running simulations (this may take a moment)..."):
-                    start = time.time()
-                    percents_dict, df_odds = simulate_lotteries(st.session_state.teams, n_simulations=runs)
-                    st.session_state.simulated_odds = percents_dict
-                    st.session_state.simulated_odds_df = df_odds
-                    took = time.time() - start
-                    st.success(f"Simulation done ({runs} runs) in {took:.1f}s. Results stored.")
+                try:
+                    job = get_job_scheduler().submit(
+                        st.session_state.session_id, st.session_state.teams, engine, picks=int(odds_picks),
+                        n_simulations=int(runs), precision=(precision or None), workers=workers,
+                        fmt=st.session_state.teams.format,
+                    )
+                    st.session_state.odds_job = job.id
+                    st.session_state.odds_job_message = None
+                except ValueError as e:
+                    st.error(str(e))
+
+        def _odds_job_status():
+            """Polls the session's background odds job and stores the odds once it is done."""
+            job = get_job_scheduler().get(st.session_state.odds_job) if st.session_state.odds_job else None
+            if job is None:
+                return
+            if job.active:
+                total = job.kwargs["n_simulations"]
+                label = "Queued…" if job.status == "queued" else (
+                    f"{job.runs_done:,} / {total:,} runs" if job.max_half_width is None else
+                    f"{job.runs_done:,} / {total:,} runs · widest 95% CI ±{job.max_half_width:.4f} pp")
+                st.progress(min(job.runs_done / total, 1.0), text=label)
+                if len(job.sessions) > 1:
+                    st.caption(f"Shared with {len(job.sessions) - 1} other session(s) asking for the same odds.")
+                partial = job.odds()
+                if partial is not None:
+                    st.caption("Running estimate (refreshes while the simulation runs):")
+                    st.dataframe(partial.frame(), height=200)
+                if st.button("⏹️ Cancel simulation"):
+                    get_job_scheduler().cancel(job.id, st.session_state.session_id)
+                    st.session_state.odds_job = None
+                    st.session_state.odds_job_message = ("info", "Simulation cancelled.")
+                    st.rerun()
+                return
+            st.session_state.odds_job = None
+            if job.status == "failed":
+                st.session_state.odds_job_message = ("error", f"Odds computation failed: {job.error}")
+            elif job.status == "cancelled":
+                st.session_state.odds_job_message = ("info", "Simulation cancelled.")
+            else:
+                info = job.result[3]
+                engine_done = job.kwargs["engine"]
+                st.session_state.odds = job.odds()
+                if info["from_cache"]:
+                    message = f"Odds loaded from cache in {job.elapsed:.3f}s (same tickets seen before)."
+                elif engine_done == "exact":
+                    message = f"Exact odds computed in {job.elapsed:.2f}s. Results stored."
+                else:
+                    done_runs = info["runs"]
+                    message = (f"Simulation done ({done_runs} runs, {job.kwargs['workers']} worker(s)) in "
+                               f"{job.elapsed:.1f}s ({done_runs / max(job.elapsed, 1e-9):,.0f} runs/s, "
+                               f"seed {info['seed']}). Results stored.")
+                    if done_runs < job.kwargs["n_simulations"]:
+                        message += (f" Stopped early: every team/pick probability is within "
+                                    f"±{job.kwargs['precision']:.3f} percentage points.")
+                st.session_state.odds_job_message = ("success", message)
+            st.rerun()
+
+        job_running = st.session_state.odds_job is not None
+        st.fragment(_odds_job_status, run_every=(0.5 if job_running else None))()
+        if st.session_state.get("odds_job_message"):
+            kind, message = st.session_state.odds_job_message
+            getattr(st, kind)(message)
+        jobs_stats = get_job_scheduler().summary()
+        st.caption(f"Odds jobs on this server: {jobs_stats['running']} running · {jobs_stats['queued']} queued "
+                   f"(pool of {jobs_stats['max_jobs']})")
+        cache_stats = get_odds_cache().summary()
+        st.caption(
+            f"Odds cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits "
+            f"({cache_stats['disk_hits']} from disk) · {cache_stats['misses']} misses · "
+            f"{cache_stats['entries']} in memory · {cache_stats['disk_entries']} on disk "
+            f"({cache_stats['disk_bytes'] / 1024:.0f} KB)"
+        )
     with sim_col1:
-        if st.session_state.simulated_odds_df is not None:
-            st.subheader("Simulated odds (sample)")
-            st.dataframe(st.session_state.simulated_odds_df)
-            csv_sim = st.session_state.simulated_odds_df.to_csv().encode("utf-8")
-            st.download_button("Download simulated odds CSV", data=csv_sim, file_name="simulated_odds.csv", mime="text/csv")
+        odds = st.session_state.odds
+        if odds is not None:
+            st.subheader(f"Pick odds ({ENGINE_LABELS[odds.engine]})")
+            st.dataframe(odds.frame())
+            st.download_button("Download simulated odds CSV", data=odds.csv, file_name="simulated_odds.csv",
+                               mime="text/csv")
         else:
             st.info("No simulated odds yet. Run the simulation to compute per-pick probabilities.")
 # -----------------------
 # TAB 2: Draft-Lottery
 # -----------------------
 
-import random  # ensure we can use random.choice for flavor text
-
 # --- Helper for pick commentary ---
-def pick_commentary(team, pick_number, delta, original_tickets):
+def pick_commentary(team, pick_number, delta, original_tickets, total_tickets, rng):
     messages = []
 
     # Delta-based messages
@@ -289,10 +437,11 @@ def pick_commentary(team, pick_number, delta, original_tickets):
         else:
             messages.append("⏺️ No change vs seed. Steady as she goes!")
 
-    # Underdog / ticket-based messages
-    if original_tickets <= 30:
+    # Underdog / ticket-based messages (thresholds as shares of a 1000-ticket pool)
+    share = original_tickets / total_tickets * 1000
+    if share <= 30:
         messages.append("🔥 Wow, what a Nico Harrison kind of move! Maybe you traded Luka away last season?")
-    elif original_tickets >= 400:
+    elif share >= 400:
         messages.append("🏀 Congrats! The league will be your's, if you pick wisely!")
 
     # Pick number commentary
@@ -319,32 +468,23 @@ def pick_commentary(team, pick_number, delta, original_tickets):
         "Nothing but net!",
         "Clutch performance!"
     ]
-    messages.append(random.choice(flavor_phrases))
+    messages.append(flavor_phrases[int(rng.integers(len(flavor_phrases)))])
 
     return " ".join(messages)
- 
-with tab2:
-    # --- League + year headline ---
-    league_title = st.session_state.get("league_name", "Fantasy League")
-    draft_year = st.session_state.get("draft_year", 2026)
-    st.markdown(f"## 🎉 {league_title} Fantasy Draft Lottery Ceremony {draft_year}")
 
-    # --- Intro commentary only once ---
-    if "intro_shown" not in st.session_state:
-        st.session_state.intro_shown = False
 
-    if not st.session_state.intro_shown:
-        st.markdown("""
-        Welcome to the official **Fantasy Draft Lottery!**
-        The ping-pong balls are loaded, the tension is rising… and the future of your franchise is about to change forever.
-        """)
-        if st.button("🔥 Start the lottery show"):
-            st.session_state.intro_shown = True
-            st.session_state.pick_commentary = []
-            st.session_state.draft_order = []
-            st.session_state.drawn_combos = []
-            st.session_state.remaining_df = st.session_state.assignment_df.copy()
-            st.success("Let’s begin! The first ball is about to drop…")
+@metrics.timed("rerun.ceremony")
+def ceremony():
+    """
+    Draw controls and results of the ceremony tab, run as a fragment.
+
+    Drawing a pick reruns only this function, not the setup tab; buttons that
+    change the league (restart, reset) rerun the whole app.
+    """
+    metrics.bind(st.session_state.metrics)  # fragment reruns skip the top of the script
+    notice = st.session_state.pop("ceremony_notice", None)
+    if notice:
+        st.success(notice)
     st.subheader("Manual or Auto Draw")
 
     if not st.session_state.teams:
@@ -363,31 +503,47 @@ with tab2:
 
 # --- MANUAL MODE ---
         if draw_mode == "🎯 Manual Input":
+            assignment = st.session_state.assignment
+            balls = assignment.balls if assignment is not None else BALLS
+            drawn = assignment.drawn if assignment is not None else DRAWN
             st.markdown(
-                "Enter the 4 numbers you physically drew (each between 1–14). Order doesn’t matter. "
+                f"Enter the {drawn} numbers you physically drew (each between 1–{balls}). Order doesn’t matter. "
                 "The app will lookup the assigned combination and award that team."
             )
-            c1, c2, c3, c4 = st.columns(4)
-            z1 = c1.number_input("Number 1", min_value=1, max_value=14, step=1, key="z1_draw", value=1)
-            z2 = c2.number_input("Number 2", min_value=1, max_value=14, step=1, key="z2_draw", value=2)
-            z3 = c3.number_input("Number 3", min_value=1, max_value=14, step=1, key="z3_draw", value=3)
-            z4 = c4.number_input("Number 4", min_value=1, max_value=14, step=1, key="z4_draw", value=4)
+            number_cols = st.columns(drawn)
+            numbers = [
+                number_cols[i].number_input(f"Number {i + 1}", min_value=1, max_value=balls, step=1,
+                                            key=f"z{i + 1}_draw", value=min(i + 1, balls))
+                for i in range(drawn)
+            ]
 
             if st.button("Check combination & award pick"):
-                combo_str = " ".join(map(str, sorted([int(z1), int(z2), int(z3), int(z4)])))
-                row = st.session_state.remaining_df.loc[st.session_state.remaining_df["Combination"] == combo_str]
-
-                if row.empty:
+                team = None
+                rank = None
+                team_id = -1
+                try:
+                    rank = combo_rank(numbers, balls, drawn)
+                    team_id = st.session_state.live.team_id(rank) if st.session_state.live is not None else -1
+                    if team_id >= 0:
+                        team = st.session_state.teams.teams[team_id]
+                except ValueError:
+                    pass
+
+                if rank is not None and st.session_state.live is not None and team_id < 0:
+                    st.warning("🔁 This combination is not assigned to any team. Redraw!")
+                elif team is None:
                     st.error(
                         "Combination not found or already removed. Double-check the numbers or download the initial assignment CSV."
                     )
                 else:
-                    team = row.iloc[0]["Team"]
-                    if team in st.session_state.draft_order:
-                        st.warning(f"{team} already has a pick assigned.")
+                    if not st.session_state.live.is_live(team_id):
+                        if any(t == team_id for _, t in st.session_state.live.drawn):
+                            st.warning(f"{team} already has a pick assigned.")
+                        else:
+                            st.warning(f"🔁 {team} keeps its protected pick and is not in the draw. Redraw!")
                     else:
                         # Original tickets %
-                        total_tickets = sum(st.session_state.teams.values())
+                        total_tickets = st.session_state.teams.total
                         original_tickets = st.session_state.teams.get(team, 0)
                         original_pct = round(original_tickets / total_tickets * 100, 2)
 
@@ -396,85 +552,75 @@ with tab2:
                         pick_number = len(st.session_state.draft_order)
 
                         # Fetch simulated odds if available
-                        pre_pct = None
-                        if st.session_state.simulated_odds:
-                            pre_pct = st.session_state.simulated_odds.get(team, {}).get(pick_number, None)
-
-                        # Compute seed position
-                        sorted_by_tickets = sorted(st.session_state.teams.items(), key=lambda x: x[1], reverse=True)
-                        seed_map = {t: idx + 1 for idx, (t, _) in enumerate(sorted_by_tickets)}
-                        original_seed = seed_map.get(team, None)
+                        odds = st.session_state.odds
+                        pre_pct = odds.percent(team, pick_number) if odds is not None else None
+
+                        # Seed position
+                        original_seed = st.session_state.teams.seed(team)
                         delta = original_seed - pick_number if original_seed is not None else None
 
                         # --- Pick commentary ---
-                        commentary = pick_commentary(team, pick_number, delta, original_tickets)
+                        commentary = pick_commentary(team, pick_number, delta, original_tickets,
+                                                     st.session_state.teams.total, st.session_state.rng)
 
                         st.success(
                             f"🏆 {team} awarded Pick {pick_number} (original tickets: {original_tickets}, {original_pct}%)"
                         )
                         if pre_pct is not None:
-                            st.info(f"📊 Simulated chance for this pick: {pre_pct:.4f}%")
+                            engine_label = "exact" if odds.engine == "exact" else "simulated"
+                            st.info(f"📊 Pre-draw chance for this pick ({engine_label}): {pre_pct:.4f}%")
                         else:
-                            st.info("📊 Simulated odds not available (run simulation in Setup tab).")
+                            st.info("📊 Pick odds not available (run simulation in Setup tab).")
 
                         st.info(commentary)
 
                         # Remove all combos of this team
-                        st.session_state.remaining_df = st.session_state.remaining_df[
-                            st.session_state.remaining_df["Team"] != team
-                        ]
+                        st.session_state.live.award(rank, team_id)
+                        for message in give_seeded_picks():
+                            st.info(message)
                         st.session_state.reset_inputs = True
-                        st.session_state.drawn_combos.append(
-                            {
-                                "Combination": combo_str,
-                                "Team": team,
-                                "Original_Tickets": original_tickets,
-                                "Pick": pick_number
-                            }
-                        )
 
 # --- AUTO MODE ---
         elif draw_mode == "🎲 Auto Generate":
+            assignment = st.session_state.assignment
+            drawn = assignment.drawn if assignment is not None else DRAWN
             st.markdown(
-                "Click the button below to automatically generate a random 4-number combination from the remaining pool."
+                f"Click the button below to automatically generate a random {drawn}-number combination from the "
+                "remaining pool."
             )
 
             if st.button("🔀 Generate random combination"):
-                if st.session_state.remaining_df.empty:
+                if st.session_state.live is None or st.session_state.live.finished:
                     st.error("No combinations left! Restart the lottery.")
                 else:
                     # Randomly pick one combination from remaining
-                    chosen_row = st.session_state.remaining_df.sample(1).iloc[0]
-                    combo_str = chosen_row["Combination"]
-                    team = chosen_row["Team"]
+                    rank, team_id = st.session_state.live.sample(st.session_state.rng)
+                    combo_str = st.session_state.live.assignment.label(rank)
+                    team = st.session_state.live.teams[team_id]
 
                     # Award pick
                     st.session_state.draft_order.append(team)
                     pick_number = len(st.session_state.draft_order)
 
-                    # Compute seed & delta
-                    sorted_by_tickets = sorted(st.session_state.teams.items(), key=lambda x: x[1], reverse=True)
-                    seed_map = {t: idx + 1 for idx, (t, _) in enumerate(sorted_by_tickets)}
-                    original_seed = seed_map.get(team, None)
+                    # Seed & delta
+                    original_seed = st.session_state.teams.seed(team)
                     delta = original_seed - pick_number if original_seed is not None else None
 
                     # Original tickets for commentary
                     original_tickets = st.session_state.teams.get(team, 0)
 
                     # --- Pick commentary ---
-                    commentary = pick_commentary(team, pick_number, delta, original_tickets)
+                    commentary = pick_commentary(team, pick_number, delta, original_tickets,
+                                                 st.session_state.teams.total, st.session_state.rng)
 
-                    st.session_state.remaining_df = st.session_state.remaining_df[
-                        st.session_state.remaining_df["Team"] != team
-                    ]
-                    st.session_state.drawn_combos.append(
-                        {"Combination": combo_str, "Team": team, "Pick": pick_number}
-                    )
+                    st.session_state.live.award(rank, team_id)
 
                     # Display results with commentary
                     st.success(f"🎲 Auto-generated combination: **{combo_str}**")
                     st.success(f"🏆 {team} wins Pick {pick_number}")
                     st.info(commentary)
+                    for message in give_seeded_picks():
+                        st.info(message)
                     
         # --- Status + Results (shared between both modes) ---
         st.divider()
@@ -482,13 +628,11 @@ with tab2:
         if st.session_state.draft_order:
             for i, t in enumerate(st.session_state.draft_order, start=1):
                 pre = ""
-                if st.session_state.simulated_odds:
-                    v = st.session_state.simulated_odds.get(t, {}).get(i, None)
+                if st.session_state.odds is not None:
+                    v = st.session_state.odds.percent(t, i)
                     pre = f"{v:.4f}%" if v is not None else "N/A"
                 # compute delta text
-                sorted_by_tickets = sorted(st.session_state.teams.items(), key=lambda x: x[1], reverse=True)
-                seed_map = {team: idx+1 for idx,(team,_) in enumerate(sorted_by_tickets)}
-                orig = seed_map.get(t)
+                orig = st.session_state.teams.seed(t)
                 delta = orig - i if orig is not None else None
                 delta_txt = f"+{delta}" if delta and delta>0 else (f"{delta}" if delta else "0")
                 st.write(f"Pick {i}: {t} ({pre}, Δ {delta_txt})")
@@ -497,54 +641,150 @@ with tab2:
         st.divider()
         
         st.subheader("Live status")
-        st.markdown(f"Remaining combinations: **{len(st.session_state.remaining_df)}**")
-        total_remaining = len(st.session_state.remaining_df)
-        team_counts = st.session_state.remaining_df["Team"].value_counts().to_dict()
-        rows = []
-        for t, tk in st.session_state.teams.items():
-            cnt = team_counts.get(t, 0)
-            pct = round((cnt / total_remaining * 100), 4) if total_remaining>0 else 0.0
-            rows.append({"Team": t, "Remaining combos": cnt, "Current chance (%)": pct})
-        st.table(pd.DataFrame(rows).sort_values("Current chance (%)", ascending=False))
-        st.bar_chart(pd.DataFrame(rows).set_index("Team")["Current chance (%)"])
+        live = st.session_state.live
+        st.markdown(f"Remaining combinations: **{live.total_remaining if live is not None else 0}**")
+        if live is not None:
+            status = live.status_frame()
+            status_col, odds_col = st.columns([1, 1])
+            with status_col:
+                st.table(status)
+                st.bar_chart(status.set_index("Team")["Current chance (%)"])
+            with odds_col:
+                st.markdown("**Odds for the remaining picks** (given the picks drawn so far)")
+                if len(st.session_state.draft_order) < len(st.session_state.teams):
+                    start = time.time()
+                    _, cond_df, cond_info = conditional_odds(st.session_state.teams, st.session_state.draft_order,
+                                                             cache=get_live_odds_cache(),
+                                                             fmt=st.session_state.teams.format)
+                    took_ms = (time.time() - start) * 1000
+                    st.dataframe(cond_df)
+                    engine_label = "exact" if cond_info["engine"] == "exact" else f"Monte-Carlo, {cond_info['runs']:,} runs"
+                    st.caption(f"{engine_label} · {'cached' if cond_info['from_cache'] else 'computed'} in {took_ms:.0f} ms")
+                else:
+                    st.write("All picks have been drawn.")
 
 
         st.divider()
         st.subheader("Drawn combinations")
-        if st.session_state.drawn_combos:
-            st.table(pd.DataFrame(st.session_state.drawn_combos))
+        if live is not None and live.drawn:
+            drawn_df = live.drawn_frame()
+            st.table(drawn_df)
         else:
             st.write("No combinations drawn yet.")
 
         st.markdown("---")
         st.subheader("Downloads & tables")
-        if st.session_state.drawn_combos:
-            st.download_button("Download drawn combos CSV", data=pd.DataFrame(st.session_state.drawn_combos).to_csv(index=False).encode("utf-8"), file_name="drawn_combos.csv", mime="text/csv")
-        # always allow current draft PDF
-        pdf_buf = generate_draft_pdf(st.session_state.draft_order)
-        st.download_button("Download draft order as PDF", data=pdf_buf, file_name="draft_order.pdf", mime="application/pdf")
+        if live is not None and live.drawn:
+            drawn_csv = drawn_df.to_csv(index=False).encode("utf-8")
+            st.download_button("Download drawn combos CSV", data=drawn_csv, file_name="drawn_combos.csv", mime="text/csv")
+        if live is not None:
+            # same pipeline as `python -m lottery_engine report` (memoized per ceremony state, rendered on click)
+            report = CeremonyReport.from_live(live, league=st.session_state.league_name,
+                                              year=st.session_state.league_year, odds=st.session_state.odds)
+            key = report.key()
+            st.download_button("Download ceremony report (PDF)", data=lambda: ceremony_report_files(key, report)[0],
+                               file_name="ceremony_report.pdf", mime="application/pdf")
+            st.download_button("Download report bundle (ZIP: PDF + CSVs)",
+                               data=lambda: ceremony_report_files(key, report)[1],
+                               file_name="ceremony_report.zip", mime="application/zip")
+        # always allow the plain draft order PDF too (memoized per draft order, rendered on click)
+        order = tuple(st.session_state.draft_order)
+        st.download_button("Download draft order as PDF", data=lambda: draft_pdf_bytes(order),
+                           file_name="draft_order.pdf", mime="application/pdf")
 
         st.divider()
+        with st.expander("🎲 Session random seed"):
+            st.write("Assignments, auto draws and commentary of this session all come from one random stream. "
+                     "Enter a seed and restart the lottery to replay a ceremony.")
+            seed_text = st.text_input("Seed", value=str(st.session_state.rng_seed))
+            if st.button("Use this seed"):
+                try:
+                    st.session_state.rng_seed = int(seed_text)
+                    st.session_state.rng = make_rng(st.session_state.rng_seed)
+                    st.success("Seed set. Restart the lottery to draw from it.")
+                except ValueError:
+                    st.error("The seed must be a whole number.")
         if st.button("Restart lottery (keep teams)"):
             # regenerate combos and reset draws
-            st.session_state.assignment_df = assign_combinations_to_teams(st.session_state.teams)
-            st.session_state.remaining_df = st.session_state.assignment_df.copy()
-            st.session_state.draft_order = []
-            st.session_state.drawn_combos = []
-            st.session_state.simulated_odds = None
-            st.session_state.simulated_odds_df = None
+            previous = st.session_state.assignment
+            st.session_state.assignment = assign_combinations_to_teams(
+                st.session_state.teams,
+                seed=derive_seed(st.session_state.rng),
+                balls=previous.balls if previous is not None else BALLS,
+                drawn=previous.drawn if previous is not None else DRAWN,
+            )
+            start_live_lottery()
+            st.session_state.odds = None
             st.session_state.reset_inputs = True
-            st.success("Lottery restarted (teams preserved).")
+            st.session_state.ceremony_notice = "Lottery restarted (teams preserved)."
+            st.rerun()
         if st.button("Reset everything (clear teams)"):
-            st.session_state.teams = {}
-            st.session_state.assignment_df = pd.DataFrame(columns=["Combination","Team"])
-            st.session_state.remaining_df = st.session_state.assignment_df.copy()
+            st.session_state.teams = League()
+            st.session_state.assignment = None
+            st.session_state.live = None
             st.session_state.draft_order = []
-            st.session_state.drawn_combos = []
-            st.session_state.simulated_odds = None
-            st.session_state.simulated_odds_df = None
+            st.session_state.odds = None
             st.session_state.reset_inputs = True
-            st.success("All cleared.")
+            st.session_state.ceremony_notice = "All cleared."
+            st.rerun()
+
+
+with tab2:
+    # --- League + year headline ---
+    league_title = st.session_state.get("league_name", "Fantasy League")
+    draft_year = st.session_state.get("draft_year", 2026)
+    st.markdown(f"## 🎉 {league_title} Fantasy Draft Lottery Ceremony {draft_year}")
+
+    # --- Intro commentary only once ---
+    if "intro_shown" not in st.session_state:
+        st.session_state.intro_shown = False
+
+    if not st.session_state.intro_shown:
+        st.markdown("""
+        Welcome to the official **Fantasy Draft Lottery!**
+        The ping-pong balls are loaded, the tension is rising… and the future of your franchise is about to change forever.
+        """)
+        if st.button("🔥 Start the lottery show"):
+            st.session_state.intro_shown = True
+            st.session_state.pick_commentary = []
+            st.session_state.draft_order = []
+            if st.session_state.assignment is not None:
+                start_live_lottery()
+            st.success("Let’s begin! The first ball is about to drop…")
+    st.fragment(ceremony)()
+
+
+def performance_panel():
+    """Timing tables and exports of this session and of the whole process."""
+    # one switch for the whole server, so it is the operator's (environment), not any session's
+    if metrics.enabled():
+        st.caption("Recording timings for every session of this server (FANTASY_LOTTERY_METRICS=1).")
+    else:
+        st.caption("Timing is off: instrumented code only pays a flag check. "
+                   "Start the server with FANTASY_LOTTERY_METRICS=1 to record.")
+    for label, registry, scope in (("This session", st.session_state.metrics, "session"),
+                                   ("Whole process", metrics.PROCESS, "process")):
+        st.markdown(f"**{label}**")
+        rows = registry.summary()
+        if rows:
+            st.dataframe(pd.DataFrame(rows).round(3), hide_index=True)
+        else:
+            st.write("No timings recorded yet.")
+        if registry.counters:
+            st.write(", ".join(f"{name}: {value:,}" for name, value in sorted(registry.counters.items())))
+        col_json, col_prom, col_reset = st.columns(3)
+        col_json.download_button("Download JSON", data=registry.to_json, file_name=f"metrics_{scope}.json",
+                                 mime="application/json", key=f"metrics_json_{scope}")
+        col_prom.download_button("Download Prometheus", data=lambda registry=registry, scope=scope: registry.to_prometheus(
+                                     labels={"scope": scope}),
+                                 file_name=f"metrics_{scope}.prom", mime="text/plain", key=f"metrics_prom_{scope}")
+        if col_reset.button("Reset", key=f"metrics_reset_{scope}"):
+            registry.reset()
+            st.rerun()
+
 
 st.markdown("---")
+with st.expander("⏱️ Performance"):
+    performance_panel()
+metrics.observe("rerun", time.perf_counter() - rerun_started)
 st.caption("Powered by Streamlit • Created by Flensballers Fantasy League 2026 🏀")
@@ -0,0 +1,31 @@
+# lottery_engine/__init__.py
+"""
+Headless engine of the fantasy draft lottery.
+
+Importing the package only loads NumPy; pandas (DataFrame outputs) and
+reportlab (PDF export) are imported by the functions that need them.
+"""
+from .audit import audit_draws, audit_assignments, export_teams, read_assignment_teams
+from .cache import OddsCache, default_cache_dir
+from .combos import (
+    BALLS, DRAWN, COMBO_COUNT, LOTTERY_TICKETS,
+    combo_rank, combo_rank_many, combo_unrank, combo_unrank_many, combo_label, generate_all_combinations,
+    ComboAssignment, assign_combinations_to_teams, assignment_frame, iter_assignment_csv,
+)
+from .design import ticket_curves, drop_probabilities, solve_tickets, tickets_by_seed
+from .formats import LotteryFormat, FULL_DRAW
+from .jobs import JobScheduler, OddsJob
+from .league import League
+from .live import LiveLottery
+from .metrics import Metrics
+from .odds import (
+    RUN_CHUNK, EXACT_MAX_STATES, LIVE_EXACT_MAX_STATES, LIVE_RUNS,
+    wilson_half_width, rb_half_width, default_workers, simulate_progressive, simulate_counts, simulate_lotteries,
+    OddsTable, exact_odds, choose_odds_engine, odds_matrix, compute_odds, conditional_odds, sweep_odds,
+)
+from .orders import (
+    OrderStore, Event, Value, lands, top, before, pick_of, protected_pick, swap_best, swap_worst, value_curve,
+)
+from .pdf import generate_draft_pdf
+from .report import CeremonyReport, read_ceremony_csv, read_ceremonies, report_pdf, report_csvs, write_reports
+from .rng import new_seed, make_rng, chunk_rng, derive_seed
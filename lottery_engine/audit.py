@@ -0,0 +1,387 @@
+# lottery_engine/audit.py
+"""
+Fairness audit of exported ceremonies against the theoretical odds.
+
+audit_draws streams drawn_combos.csv exports (Combination, Team,
+Original_Tickets, Pick; several ceremonies may be concatenated, each one
+starting again at Pick 1) chunk by chunk and groups the ceremonies by
+ticket configuration. For every configuration it counts which seed landed
+each pick, computes the expected odds with the same engine and cache as
+the app, and runs a chi-square test per pick. Teams with equal tickets
+are pooled, since an export cannot tell which of them was seeded first.
+Drawn combinations are ranked with the app's combinadic encoding and
+tested for uniformity over the pool: the assignment is reshuffled every
+ceremony, so every combination is equally likely to come up.
+
+audit_assignments checks assignment.csv exports (Combination, Team, one
+ceremony per file): combinations must be spread over the pool without
+regard to ticket count, so the owner of a combination, by seed, should not
+depend on where its rank falls.
+
+Only finished ceremonies should be audited: the teams and tickets of a
+ceremony are read from its rows. Exports without Original_Tickets (the
+auto-draw mode of older versions left it out or blank) take each team's
+tickets from a teams table instead: one given by the caller, else the
+assignment CSV exported with them (export_teams). Ceremonies whose
+tickets are still unknown are skipped, and counted by reason. Needs
+pandas for CSV parsing.
+"""
+import math
+import os
+
+import numpy as np
+
+from .combos import BALLS, DRAWN, _splitmix64, combo_rank_many
+from .formats import as_format
+from .odds import choose_odds_engine, odds_matrix
+
+# Rows parsed per CSV chunk.
+AUDIT_CHUNK = 1_000_000
+BY_SEED = "by seed"
+# Reasons a ceremony is left out of the audit.
+SKIP_ORDER = "picks not 1..n in order"
+SKIP_TICKETS = "tickets unknown (no Original_Tickets, not in the teams or assignment CSV)"
+
+
+def _chi2_sf(x, df):
+    """P(chi-square with df degrees of freedom > x), from the regularized upper incomplete gamma function."""
+    if df <= 0:
+        return 1.0
+    if x <= 0:
+        return 1.0
+    if df > 2000:
+        # Wilson-Hilferty: (x/df)^(1/3) is close to normal for large df
+        z = ((x / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+        return 0.5 * math.erfc(z / math.sqrt(2))
+    a, x = df / 2, x / 2
+    log_front = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # series for the lower function
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_front))
+    # continued fraction for the upper function (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        step = d * c
+        h *= step
+        if abs(step - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_front) * h)
+
+
+def _chi2_test(observed, expected):
+    """(chi2, df, p_value, impossible) of counts against expected counts; outcomes with zero odds fail outright."""
+    possible = expected > 1e-12
+    impossible = int(observed[~possible].sum())
+    chi2 = float((((observed - expected) ** 2)[possible] / expected[possible]).sum())
+    df = int(possible.sum()) - 1
+    return chi2, df, 0.0 if impossible else _chi2_sf(chi2, df), impossible
+
+
+def _expand(paths, prefix):
+    """Files as given, plus every <prefix>*.csv below the given directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files += [os.path.join(root, n) for n in sorted(names) if n.startswith(prefix) and n.endswith(".csv")]
+        else:
+            files.append(path)
+    return files
+
+
+def _parse_ranks(labels, balls, drawn):
+    """Combination ranks of a Series of labels such as '1 5 9 13' (each distinct label is parsed once)."""
+    import pandas as pd
+
+    codes, uniques = pd.factorize(labels)
+    if not len(uniques):
+        return np.empty(0, dtype=np.int64)
+    parts = [label.split() for label in uniques]
+    if any(len(numbers) != drawn for numbers in parts):
+        raise ValueError(f"A combination needs {drawn} numbers separated by spaces.")
+    return combo_rank_many(np.array(parts, dtype=np.int64), balls, drawn)[codes]
+
+
+def _numeric(column):
+    import pandas as pd
+
+    return column if pd.api.types.is_numeric_dtype(column) else pd.to_numeric(column, errors="coerce")
+
+
+def read_assignment_teams(path, chunk_rows=AUDIT_CHUNK):
+    """
+    Ordered {team: tickets} of an assignment CSV export: combinations per team.
+
+    Teams come in order of first appearance; the app writes the file team
+    by team in listing order, so that is the league's listing order.
+    """
+    import pandas as pd
+
+    teams = {}
+    for chunk in pd.read_csv(path, usecols=["Combination", "Team"], dtype=str, chunksize=chunk_rows):
+        chunk = chunk[chunk["Combination"] != "Combination"]  # repeated header lines
+        for team, n in chunk["Team"].value_counts(sort=False).items():
+            teams[team] = teams.get(team, 0) + int(n)
+    return teams
+
+
+def paired_assignment(path):
+    """The assignment CSV exported with a drawn-combos CSV (drawn_combos_2024.csv -> assignment_2024.csv), or None."""
+    folder, name = os.path.split(path)
+    if not name.startswith("drawn_combos"):
+        return None
+    candidate = os.path.join(folder, "assignment" + name[len("drawn_combos"):])
+    return candidate if os.path.isfile(candidate) else None
+
+
+def export_teams(path, teams=None):
+    """
+    Ordered {team: tickets} behind a drawn-combos export, or None if unknown.
+
+    teams (a {team: tickets} mapping, e.g. a CLI --teams file) wins; else
+    the tickets are counted from the paired assignment CSV. Either one
+    also gives the listing order that breaks seed ties.
+    """
+    if teams is not None:
+        return dict(teams)
+    assignment = paired_assignment(path)
+    return None if assignment is None else read_assignment_teams(assignment)
+
+
+def _ceremony_chunks(path, chunk_rows, teams=None):
+    """
+    DataFrames of whole ceremonies (Pick, Tickets, Combination) from one drawn-combos CSV.
+
+    Missing or blank Original_Tickets are looked up by Team in `teams`;
+    Tickets is -1 where they stay unknown.
+    """
+    import pandas as pd
+
+    carry = None
+    columns = set(pd.read_csv(path, nrows=0).columns)
+    usecols = [c for c in ("Combination", "Team", "Original_Tickets", "Pick") if c in columns]
+    reader = pd.read_csv(path, usecols=usecols, dtype={"Combination": str, "Team": str}, chunksize=chunk_rows)
+    for chunk in reader:
+        picks = _numeric(chunk["Pick"])
+        keep = picks.notna()  # repeated header lines of concatenated exports
+        chunk = chunk[keep]
+        tickets = (_numeric(chunk["Original_Tickets"]) if "Original_Tickets" in columns
+                   else pd.Series(np.nan, index=chunk.index))
+        if teams is not None and "Team" in columns:
+            tickets = tickets.fillna(chunk["Team"].str.strip().map(teams))
+        chunk = pd.DataFrame({"Pick": picks[keep].astype(np.int64), "Tickets": tickets.fillna(-1).astype(np.int64),
+                              "Combination": chunk["Combination"].str.strip()})
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        starts = np.flatnonzero(chunk["Pick"].to_numpy() == 1)
+        cut = starts[-1] if len(starts) else 0  # the last ceremony may go on in the next chunk
+        if cut:
+            yield chunk.iloc[:cut]
+        carry = chunk.iloc[cut:]
+    if carry is not None and len(carry):
+        yield carry
+
+
+class _DrawTally:
+    """Pick counts per ticket configuration and combination counts, accumulated chunk by chunk."""
+
+    def __init__(self, balls, drawn):
+        self.balls, self.drawn = balls, drawn
+        self.configs = {}  # tickets in seed order -> [ceremonies, (seed x pick) counts]
+        self.combos = np.zeros(math.comb(balls, drawn), dtype=np.int64)
+        self.ceremonies = 0
+        self.skipped = {}  # reason -> ceremonies
+
+    def skip(self, reason, n=1):
+        if n:
+            self.skipped[reason] = self.skipped.get(reason, 0) + int(n)
+
+    def add(self, frame):
+        pick = frame["Pick"].to_numpy()
+        tickets = frame["Tickets"].to_numpy()
+        ceremony = np.cumsum(pick == 1) - 1  # -1: rows before the first Pick 1
+        if ceremony[-1] < 0:
+            self.skip(SKIP_ORDER)
+            return
+        starts = np.searchsorted(ceremony, np.arange(ceremony[-1] + 1))
+        row_ok = ceremony >= 0
+        # a ceremony counts when its picks run 1..n in order and every team's tickets are known
+        row_ok[row_ok] &= pick[row_ok] == np.arange(len(pick))[row_ok] - starts[ceremony[row_ok]] + 1
+        bad_order = np.zeros(len(starts), dtype=bool)
+        bad_order[ceremony[~row_ok & (ceremony >= 0)]] = True
+        no_tickets = np.zeros(len(starts), dtype=bool)
+        no_tickets[ceremony[(tickets < 0) & (ceremony >= 0)]] = True
+        self.skip(SKIP_ORDER, bad_order.sum() + (ceremony < 0).any())
+        self.skip(SKIP_TICKETS, (no_tickets & ~bad_order).sum())
+        good = ~(bad_order | no_tickets)
+        rows = good[np.maximum(ceremony, 0)] & (ceremony >= 0)
+        if not rows.any():
+            return
+        pick, tickets, ceremony = pick[rows], tickets[rows], ceremony[rows]
+        combos = frame["Combination"][rows]
+        is_drawn = combos != BY_SEED
+        self.combos += np.bincount(_parse_ranks(combos[is_drawn], self.balls, self.drawn), minlength=len(self.combos))
+
+        # seed = rank by tickets within the ceremony (ties in export order; they are pooled later)
+        order = np.lexsort((-tickets, ceremony))
+        ceremony_ids, first = np.unique(ceremony, return_index=True)
+        ceremony_index = np.searchsorted(ceremony_ids, ceremony)
+        seed = np.empty(len(order), dtype=np.int64)
+        seed[order] = np.arange(len(order)) - first[ceremony_index[order]]
+        sorted_tickets = tickets[order]
+        lengths = np.diff(np.append(first, len(order)))
+        with np.errstate(over="ignore"):
+            mixed = sorted_tickets.astype(np.uint64) * _splitmix64(seed[order].astype(np.uint64))
+            key = np.add.reduceat(mixed, first) ^ _splitmix64(lengths.astype(np.uint64))
+        _, examples, config_of, counts = np.unique(key, return_index=True, return_inverse=True, return_counts=True)
+        self.ceremonies += len(first)
+
+        row_config = config_of[ceremony_index]
+        by_config = np.argsort(row_config, kind="stable")
+        bounds = np.searchsorted(row_config[by_config], np.arange(len(examples) + 1))
+        for c, example in enumerate(examples):
+            c_rows = by_config[bounds[c]:bounds[c + 1]]
+            n = int(lengths[example])
+            config = tuple(sorted_tickets[first[example]:first[example] + n].tolist())
+            entry = self.configs.get(config)
+            if entry is None:
+                entry = self.configs[config] = [0, np.zeros((n, n), dtype=np.int64)]
+            entry[0] += int(counts[c])
+            entry[1] += np.bincount(seed[c_rows] * n + pick[c_rows] - 1, minlength=n * n).reshape(n, n)
+
+
+def audit_draws(paths, fmt=None, balls=BALLS, drawn=DRAWN, engine="auto", n_simulations=1_000_000, seed=None,
+                cache=None, chunk_rows=AUDIT_CHUNK, teams=None):
+    """
+    Goodness of fit of exported ceremonies (drawn_combos*.csv files, or directories holding them).
+
+    fmt is the lottery format the ceremonies were run under (None = every
+    pick drawn); balls/drawn the ball machine. Expected odds come from
+    odds_matrix (engine 'auto' picks exact or Monte-Carlo like the app;
+    Monte-Carlo noise adds slightly to the statistics when a configuration
+    has nearly as many ceremonies as simulated runs). teams ({team:
+    tickets}) fills in tickets the exports lack; without it each export's
+    paired assignment CSV is used (export_teams).
+
+    Returns a dict: 'ceremonies' audited, 'skipped' (ceremonies left out,
+    by reason: SKIP_ORDER or SKIP_TICKETS), 'configs' (one dict per ticket configuration: tickets
+    in seed order, ceremonies, engine, group_tickets/group_sizes of the
+    pooled seeds, observed/expected (groups x picks) counts, 'picks' with
+    chi2, df, p_value and impossible (outcomes the odds rule out) per
+    pick, and p_value, the Bonferroni-corrected smallest pick p-value) and
+    'combos' (chi-square of drawn combinations against a uniform pool).
+    """
+    fmt = as_format(fmt)
+    tally = _DrawTally(int(balls), int(drawn))
+    for path in _expand(paths, "drawn_combos"):
+        for frame in _ceremony_chunks(path, chunk_rows, export_teams(path, teams)):
+            tally.add(frame)
+
+    configs = []
+    for tickets, (ceremonies, counts) in sorted(tally.configs.items(), key=lambda item: -item[1][0]):
+        n = len(tickets)
+        chosen = choose_odds_engine(n, n, fmt) if engine == "auto" else engine
+        teams_dict = {f"Seed {i + 1}": t for i, t in enumerate(tickets)}  # already in seed order
+        _, probs, _, info = odds_matrix(teams_dict, chosen, n_simulations=n_simulations, seed=seed, cache=cache,
+                                        fmt=fmt)
+        group_starts = np.flatnonzero(np.diff(np.array(tickets), prepend=-1) != 0)
+        observed = np.add.reduceat(counts, group_starts, axis=0)
+        expected = ceremonies * np.add.reduceat(probs, group_starts, axis=0)
+        picks = []
+        for k in range(n):
+            chi2, df, p_value, impossible = _chi2_test(observed[:, k], expected[:, k])
+            picks.append({"pick": k + 1, "chi2": chi2, "df": df, "p_value": p_value, "impossible": impossible})
+        configs.append({
+            "tickets": list(tickets), "ceremonies": ceremonies, "engine": chosen, "runs": info["runs"],
+            "group_tickets": [tickets[i] for i in group_starts],
+            "group_sizes": np.diff(np.append(group_starts, n)).tolist(),
+            "observed": observed, "expected": expected, "picks": picks,
+            "p_value": min(1.0, min(p["p_value"] for p in picks) * n),
+        })
+
+    total = int(tally.combos.sum())
+    chi2, df, p_value, _ = _chi2_test(tally.combos, np.full(len(tally.combos), total / len(tally.combos)))
+    return {"ceremonies": tally.ceremonies, "skipped": tally.skipped, "configs": configs,
+            "combos": {"draws": total, "pool": len(tally.combos), "chi2": chi2, "df": df, "p_value": p_value}}
+
+
+def audit_assignments(paths, balls=BALLS, drawn=DRAWN, bins=64, chunk_rows=AUDIT_CHUNK):
+    """
+    Check that assignment*.csv exports (one ceremony per file) shuffle combinations without regard to tickets.
+
+    The pool's ranks are cut into `bins` equal ranges; in every file a
+    team with t tickets should own about t / pool of each range, and the
+    unassigned combinations should be spread the same way. Counts are
+    summed by seed over all files and compared with one chi-square
+    ((seeds + unassigned - 1) x (bins - 1) degrees of freedom, approximate
+    when files differ in ticket shares). A combination listed twice in a
+    file is counted in 'duplicates'.
+
+    Returns a dict with files, combinations, duplicates, chi2, df, p_value
+    and the observed/expected (seed x bin) counts, unassigned last.
+    """
+    import pandas as pd
+
+    pool = math.comb(int(balls), int(drawn))
+    bins = min(int(bins), pool)
+    bin_of = np.arange(pool, dtype=np.int64) * bins // pool
+    bin_size = np.bincount(bin_of, minlength=bins)
+    observed = np.zeros((0, bins), dtype=np.int64)
+    expected = np.zeros((0, bins))
+    spare_observed = np.zeros(bins, dtype=np.int64)
+    spare_expected = np.zeros(bins)
+    files = combinations = duplicates = 0
+    for path in _expand(paths, "assignment"):
+        names = {}
+        counts = np.zeros((0, bins), dtype=np.int64)
+        seen = np.zeros(pool, dtype=bool)
+        for chunk in pd.read_csv(path, usecols=["Combination", "Team"], dtype=str, chunksize=chunk_rows):
+            chunk = chunk[chunk["Combination"] != "Combination"]  # repeated header lines
+            ranks = _parse_ranks(chunk["Combination"].str.strip(), balls, drawn)
+            codes, uniques = pd.factorize(chunk["Team"])
+            team_ids = np.array([names.setdefault(name, len(names)) for name in uniques], dtype=np.int64)[codes]
+            if len(names) > len(counts):
+                counts = np.vstack([counts, np.zeros((len(names) - len(counts), bins), dtype=np.int64)])
+            counts += np.bincount(team_ids * bins + bin_of[ranks], minlength=len(counts) * bins).reshape(-1, bins)
+            duplicates += int(seen[ranks].sum()) + len(ranks) - len(np.unique(ranks))
+            seen[ranks] = True
+            combinations += len(ranks)
+        files += 1
+        tickets = counts.sum(axis=1)
+        by_seed = counts[np.argsort(-tickets, kind="stable")]
+        if len(by_seed) > len(observed):
+            grow = len(by_seed) - len(observed)
+            observed = np.vstack([observed, np.zeros((grow, bins), dtype=np.int64)])
+            expected = np.vstack([expected, np.zeros((grow, bins))])
+        observed[:len(by_seed)] += by_seed
+        expected[:len(by_seed)] += np.sort(tickets)[::-1, None] * bin_size[None, :] / pool
+        spare_observed += bin_size - counts.sum(axis=0)
+        spare_expected += bin_size * (pool - tickets.sum()) / pool
+
+    observed = np.vstack([observed, spare_observed])
+    expected = np.vstack([expected, spare_expected])
+    rows = int((expected.sum(axis=1) > 0).sum())
+    possible = expected > 1e-12
+    chi2 = float((((observed - expected) ** 2)[possible] / expected[possible]).sum())
+    df = max(0, (rows - 1) * (bins - 1))
+    impossible = int(observed[~possible].sum())
+    return {"files": files, "combinations": combinations, "duplicates": duplicates, "bins": bins, "chi2": chi2,
+            "df": df, "p_value": 0.0 if impossible else _chi2_sf(chi2, df), "observed": observed,
+            "expected": expected}
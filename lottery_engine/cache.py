@@ -0,0 +1,133 @@
+# lottery_engine/cache.py
+"""Two-level (memory + disk) LRU cache of odds results."""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def default_cache_dir():
+    """On-disk odds cache location ($FANTASY_LOTTERY_CACHE_DIR or ~/.cache/fantasy_lottery/odds)."""
+    return os.environ.get("FANTASY_LOTTERY_CACHE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".cache", "fantasy_lottery", "odds"))
+
+
+class OddsCache:
+    """
+    Two-level LRU cache of odds matrices keyed by ticket configuration.
+
+    Entries are stored for the *sorted* ticket vector, so renamed or reordered
+    teams with the same tickets share one entry. The memory layer holds up to
+    max_entries results; the disk layer (.npz files, survives restarts) is
+    trimmed to max_disk_bytes by least-recent use. Safe to share across threads.
+    """
+
+    def __init__(self, directory=None, max_entries=128, max_disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(tickets, picks, engine, runs=None, seed=None, precision=None, fmt=None, drawn=None):
+        """
+        Canonical hash of a configuration; tickets must already be sorted.
+
+        fmt is a LotteryFormat key (None for the full draw) and drawn the
+        slot-rank prefix of live odds; both are left out of the payload when
+        None so full-draw keys are unchanged.
+        """
+        if engine == "exact":
+            runs = seed = precision = None  # exact odds depend on tickets and picks only
+        config = {"tickets": [int(t) for t in tickets], "picks": int(picks), "engine": engine,
+                  "runs": runs, "seed": seed, "precision": precision}
+        if fmt is not None:
+            config["format"] = list(fmt)
+        if drawn is not None:
+            config["drawn"] = [int(r) for r in drawn]
+        payload = json.dumps(config, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Cached (probs, half_width, runs_done) or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+        entry = None
+        if self.directory and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as data:
+                    half_width = data["half_width"] if data["half_width"].size else None
+                    entry = (data["probs"], half_width, int(data["runs"]))
+                os.utime(self._path(key))
+            except (OSError, ValueError, KeyError):
+                entry = None
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, probs, half_width, runs_done):
+        entry = (probs, half_width, int(runs_done))
+        with self._lock:
+            self._remember(key, entry)
+        if self.directory:
+            tmp = self._path(key) + ".tmp.npz"
+            np.savez(tmp, probs=probs, runs=runs_done,
+                     half_width=half_width if half_width is not None else np.empty(0))
+            os.replace(tmp, self._path(key))
+            self._trim_disk()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_entries(self):
+        if not self.directory:
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz") and ".tmp" not in name:
+                try:
+                    st_ = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((st_.st_mtime, st_.st_size, name))
+        return entries
+
+    def _trim_disk(self):
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def summary(self):
+        """Stats plus current sizes, for display."""
+        with self._lock:
+            out = dict(self.stats, entries=len(self._memory))
+        disk = self._disk_entries()
+        out.update(disk_entries=len(disk), disk_bytes=sum(size for _, size, _ in disk))
+        return out
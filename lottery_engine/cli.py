@@ -0,0 +1,309 @@
+# lottery_engine/cli.py
+"""
+Command-line entry point: python -m lottery_engine {odds,assign,draw,design,orders} TEAMS_FILE
+                      or python -m lottery_engine {audit,report} EXPORTS...
+
+TEAMS_FILE is a CSV with Team,Tickets columns (header optional) or a JSON
+object {"Team": tickets}. Results go to stdout or -o as CSV or JSON. Only
+NumPy is loaded unless --pdf is used, exports are audited (pandas) or
+reports are written (reportlab).
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+from .audit import audit_assignments, audit_draws
+from .cache import OddsCache, default_cache_dir
+from .combos import BALLS, DRAWN, assign_combinations_to_teams, iter_assignment_csv
+from .design import solve_tickets, tickets_by_seed
+from .formats import LotteryFormat
+from .live import LiveLottery
+from .odds import choose_odds_engine, default_workers, odds_matrix
+from .orders import OrderStore
+from .report import read_ceremonies, write_reports
+from .rng import derive_seed, make_rng
+
+
+def read_teams(path):
+    """Ordered {team: tickets} from a CSV or JSON teams file."""
+    with open(path, encoding="utf-8") as fh:
+        text = fh.read()
+    if path.lower().endswith(".json"):
+        data = json.loads(text)
+        return {str(team): int(tickets) for team, tickets in data.items()}
+    teams = {}
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) < 2 or not row[0].strip():
+            continue
+        try:
+            tickets = int(row[1])
+        except ValueError:
+            continue  # header line
+        teams[row[0].strip()] = tickets
+    return teams
+
+
+def _write(rows, header, as_json, out):
+    if as_json:
+        json.dump(rows, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([row[h] for h in header])
+
+
+def _lottery_format(args):
+    protected = [int(s) for s in args.protected.split(",") if s.strip()] if args.protected else ()
+    return LotteryFormat(args.lottery_picks, args.max_drop, protected)
+
+
+def _cmd_odds(args, teams_dict, out):
+    picks = args.picks or len(teams_dict)
+    fmt = _lottery_format(args)
+    engine = choose_odds_engine(len(teams_dict), picks, fmt) if args.engine == "auto" else args.engine
+    cache = OddsCache(default_cache_dir()) if args.cache else None
+    teams, probs, half_width, info = odds_matrix(
+        teams_dict, engine, picks=picks, n_simulations=args.runs, seed=args.seed,
+        precision=args.precision, workers=args.workers, cache=cache, fmt=fmt,
+    )
+    print(f"engine={engine} runs={info['runs']} seed={info['seed']} from_cache={info['from_cache']}", file=sys.stderr)
+    return _odds_rows(teams, probs, half_width)
+
+
+def _odds_rows(teams, probs, half_width=None):
+    header = ["Team"]
+    for c in range(1, probs.shape[1] + 1):
+        header.append(f"Pick {c}")
+        if half_width is not None:
+            header.append(f"Pick {c} ±")
+    rows = []
+    for i, team in enumerate(teams):
+        row = {"Team": team}
+        for c in range(probs.shape[1]):
+            row[f"Pick {c + 1}"] = round(float(probs[i, c]) * 100, 4)
+            if half_width is not None:
+                row[f"Pick {c + 1} ±"] = round(float(half_width[i, c]) * 100, 4)
+        rows.append(row)
+    return rows, header
+
+
+def _cmd_assign(args, teams_dict, out):
+    assignment = assign_combinations_to_teams(teams_dict, seed=args.seed, balls=args.balls, drawn=args.drawn)
+    if args.format == "csv":
+        # streamed chunk by chunk: large pools never sit in memory as rows
+        for text in iter_assignment_csv(assignment, teams_dict):
+            out.write(text)
+        return None, None
+    names = list(teams_dict)
+    rows = [{"Combination": label, "Team": names[t]}
+            for ranks, team_ids in assignment.iter_chunks()
+            for label, t in zip(map(assignment.label, ranks), team_ids)]
+    return rows, ["Combination", "Team"]
+
+
+def _cmd_draw(args, teams_dict, out):
+    rng = make_rng(args.seed)
+    # one seeded stream, as in the app: the assignment gets a seed drawn from it, the draw the rest
+    assignment = assign_combinations_to_teams(teams_dict, seed=derive_seed(rng), balls=args.balls, drawn=args.drawn)
+    live = LiveLottery(assignment, teams_dict, _lottery_format(args))
+    live.advance()
+    while not live.finished:
+        live.award(*live.sample(rng))
+        live.advance()
+    rows = [{"Pick": pick, "Team": live.teams[t], "Combination": assignment.label(rank) if rank >= 0 else "by seed"}
+            for pick, (rank, t) in enumerate(live.drawn, start=1)]
+    if args.pdf:
+        from .pdf import generate_draft_pdf
+
+        with open(args.pdf, "wb") as fh:
+            fh.write(generate_draft_pdf([row["Team"] for row in rows]).getvalue())
+    return rows, ["Pick", "Team", "Combination"]
+
+
+def _cmd_design(args, teams_dict, out):
+    total = args.total or sum(teams_dict.values())
+    tickets, probs, info = solve_tickets(
+        len(teams_dict), total,
+        worst_pick1=None if args.worst_pick1 is None else args.worst_pick1 / 100,
+        max_drop=args.max_drop, max_drop_prob=args.max_drop_prob / 100, seed=args.seed or 0,
+    )
+    drop = "-" if info["max_drop_prob"] is None else f"{info['max_drop_prob'] * 100:.2f}%"
+    print(f"feasible={info['feasible']} worst_pick1={info['worst_pick1'] * 100:.2f}% max_drop_prob={drop} "
+          f"engine={info['engine']}", file=sys.stderr)
+    suggested = tickets_by_seed(teams_dict, tickets)
+    return [{"Team": team, "Tickets": t} for team, t in suggested.items()], ["Team", "Tickets"]
+
+
+def _cmd_orders(args, teams_dict, out):
+    store = OrderStore.simulate(args.store, teams_dict, args.runs, seed=args.seed, fmt=_lottery_format(args))
+    print(f"store={args.store} runs={store.runs} seed={store.meta['seed']}", file=sys.stderr)
+    return _odds_rows(store.teams, store.pick_odds())
+
+
+def _cmd_audit(args, teams_dict, out):
+    cache = OddsCache(default_cache_dir()) if args.cache else None
+    rows = []
+    if args.exports:
+        report = audit_draws(args.exports, fmt=_lottery_format(args), balls=args.balls, drawn=args.drawn,
+                             n_simulations=args.runs, seed=args.seed, cache=cache,
+                             teams=read_teams(args.teams) if args.teams else None)
+        combos = report["combos"]
+        for reason, n in report["skipped"].items():
+            print(f"skipped {n} ceremonies: {reason}", file=sys.stderr)
+        print(f"ceremonies={report['ceremonies']} skipped={sum(report['skipped'].values())} "
+              f"configurations={len(report['configs'])} "
+              f"combos: draws={combos['draws']} chi2={combos['chi2']:.1f} df={combos['df']} "
+              f"p={combos['p_value']:.4g}", file=sys.stderr)
+        for config in report["configs"]:
+            tickets = " ".join(map(str, config["tickets"]))
+            rows += [{"Check": "picks", "Tickets": tickets, "Ceremonies": config["ceremonies"], "Pick": test["pick"],
+                      "Chi2": round(test["chi2"], 3), "DF": test["df"], "P": test["p_value"],
+                      "Impossible": test["impossible"]} for test in config["picks"]]
+            print(f"tickets={tickets} ceremonies={config['ceremonies']} engine={config['engine']} "
+                  f"p={config['p_value']:.4g} (Bonferroni over picks)", file=sys.stderr)
+        rows.append({"Check": "combos", "Tickets": "", "Ceremonies": report["ceremonies"], "Pick": "",
+                     "Chi2": round(combos["chi2"], 3), "DF": combos["df"], "P": combos["p_value"], "Impossible": 0})
+    if args.assignments:
+        report = audit_assignments(args.assignments, balls=args.balls, drawn=args.drawn)
+        print(f"assignments: files={report['files']} duplicates={report['duplicates']} chi2={report['chi2']:.1f} "
+              f"df={report['df']} p={report['p_value']:.4g}", file=sys.stderr)
+        rows.append({"Check": "assignment", "Tickets": "", "Ceremonies": report["files"], "Pick": "",
+                     "Chi2": round(report["chi2"], 3), "DF": report["df"], "P": report["p_value"],
+                     "Impossible": report["duplicates"]})
+    if not rows:
+        raise ValueError("Nothing to audit: give drawn_combos exports and/or --assignments.")
+    return rows, ["Check", "Tickets", "Ceremonies", "Pick", "Chi2", "DF", "P", "Impossible"]
+
+
+def _cmd_report(args, teams_dict, out):
+    reports = read_ceremonies(args.exports, year=args.year, fmt=_lottery_format(args),
+                              teams=read_teams(args.teams) if args.teams else None)
+    if not reports:
+        raise ValueError("Nothing to report: no drawn_combos exports found.")
+    cache = OddsCache(default_cache_dir()) if args.cache else None
+    names = write_reports(reports, args.out, workers=args.workers, pdf=not args.no_pdf, font_path=args.font,
+                          n_simulations=args.runs, seed=args.seed, cache=cache)
+    print(f"leagues={len(reports)} files={len(names)} out={args.out}", file=sys.stderr)
+    rows = [{"League": report.title, "Teams": len(report.teams), "Picks": len(report.order),
+             "Engine": report.odds.engine} for report in reports]
+    return rows, ["League", "Teams", "Picks", "Engine"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m lottery_engine", description="Fantasy draft lottery engine.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("teams_file", help="CSV (Team,Tickets) or JSON {team: tickets}")
+        p.add_argument("--seed", type=int, default=None)
+        p.add_argument("--format", choices=["csv", "json"], default="csv")
+        p.add_argument("-o", "--output", help="output file (default: stdout)")
+
+    p_odds = sub.add_parser("odds", help="per-pick odds for every team")
+    add_common(p_odds)
+    p_odds.add_argument("--picks", type=int, default=None, help="number of picks (default: all)")
+    p_odds.add_argument("--engine", choices=["auto", "exact", "monte_carlo", "rao_blackwell"], default="auto",
+                        help="rao_blackwell: Monte-Carlo with conditional-chance scoring (tighter early picks)")
+    p_odds.add_argument("--runs", type=int, default=100000, help="Monte-Carlo runs (maximum with --precision)")
+    p_odds.add_argument("--precision", type=float, default=None, help="stop at ± this many percentage points")
+    p_odds.add_argument("--workers", type=int, default=1, help=f"worker processes (this machine: {default_workers()})")
+    p_odds.add_argument("--cache", action="store_true", help="use the on-disk odds cache")
+
+    def add_lottery_format(p):
+        p.add_argument("--lottery-picks", type=int, default=None,
+                       help="only the first N picks are drawn, the rest go by seed (default: all drawn)")
+        p.add_argument("--max-drop", type=int, default=None, help="no team ends more than N spots below its seed")
+        p.add_argument("--protected", default=None, help="comma-separated seeds that keep their own pick, e.g. 1,2")
+
+    add_lottery_format(p_odds)
+
+    def add_pool(p):
+        p.add_argument("--balls", type=int, default=BALLS, help=f"balls in the machine (default {BALLS})")
+        p.add_argument("--drawn", type=int, default=DRAWN, help=f"balls drawn per combination (default {DRAWN})")
+
+    p_assign = sub.add_parser("assign", help="assign the ball combinations to teams")
+    add_common(p_assign)
+    add_pool(p_assign)
+
+    p_draw = sub.add_parser("draw", help="run one full lottery and print the draft order")
+    add_common(p_draw)
+    add_pool(p_draw)
+    p_draw.add_argument("--pdf", help="also write the draft order PDF to this path")
+    add_lottery_format(p_draw)
+
+    p_design = sub.add_parser("design", help="suggest tickets that meet target odds (teams seeded by current tickets)")
+    add_common(p_design)
+    p_design.add_argument("--total", type=int, default=None, help="tickets to hand out (default: current total)")
+    p_design.add_argument("--worst-pick1", type=float, default=None, help="minimum pick-1 odds of seed 1, in %%")
+    p_design.add_argument("--max-drop", type=int, default=None, help="spots a team may fall below its seed")
+    p_design.add_argument("--max-drop-prob", type=float, default=1.0,
+                          help="allowed chance of a bigger drop, in %% (default 1)")
+
+    p_orders = sub.add_parser("orders", help="keep every simulated draft order in an on-disk store for joint queries")
+    add_common(p_orders)
+    p_orders.add_argument("--store", required=True, help="directory to write (orders.npy + meta.json)")
+    p_orders.add_argument("--runs", type=int, default=1_000_000, help="simulated lotteries (one byte per team each)")
+    add_lottery_format(p_orders)
+
+    p_audit = sub.add_parser("audit", help="test exported ceremonies against the theoretical odds")
+    p_audit.add_argument("exports", nargs="*",
+                         help="drawn_combos CSV exports, or directories searched for drawn_combos*.csv")
+    p_audit.add_argument("--assignments", nargs="+", default=[],
+                         help="assignment CSV exports, or directories searched for assignment*.csv")
+    p_audit.add_argument("--teams", default=None,
+                         help="teams file (Team,Tickets) for exports without Original_Tickets "
+                              "(default: the assignment CSV next to each export)")
+    p_audit.add_argument("--seed", type=int, default=None, help="seed of Monte-Carlo odds for large leagues")
+    p_audit.add_argument("--runs", type=int, default=1_000_000, help="Monte-Carlo runs per ticket configuration")
+    p_audit.add_argument("--cache", action="store_true", help="use the on-disk odds cache")
+    p_audit.add_argument("--format", choices=["csv", "json"], default="csv")
+    p_audit.add_argument("-o", "--output", help="output file (default: stdout)")
+    add_pool(p_audit)
+    add_lottery_format(p_audit)
+
+    p_report = sub.add_parser("report", help="PDF report and CSV bundle of every exported ceremony")
+    p_report.add_argument("exports", nargs="+",
+                          help="drawn_combos CSV exports, or directories searched for drawn_combos*.csv "
+                               "(a league is named after its file, or its folder for drawn_combos*.csv)")
+    p_report.add_argument("--out", required=True, help="directory (one folder per league) or .zip file to write")
+    p_report.add_argument("--teams", default=None,
+                          help="teams file (Team,Tickets) for exports without Original_Tickets "
+                               "(default: the assignment CSV next to each export)")
+    p_report.add_argument("--year", type=int, default=None, help="season shown in the report titles")
+    p_report.add_argument("--workers", type=int, default=1, help=f"worker processes (this machine: {default_workers()})")
+    p_report.add_argument("--runs", type=int, default=100000, help="Monte-Carlo runs for large leagues' pre-draw odds")
+    p_report.add_argument("--seed", type=int, default=None, help="seed of Monte-Carlo odds")
+    p_report.add_argument("--cache", action="store_true", help="use the on-disk odds cache")
+    p_report.add_argument("--font", default=None, help="TTF font for the PDFs (for names outside Latin-1)")
+    p_report.add_argument("--no-pdf", action="store_true", help="write the CSV bundles only")
+    p_report.add_argument("--format", choices=["csv", "json"], default="csv")
+    p_report.add_argument("-o", "--output", help="summary output file (default: stdout)")
+    add_lottery_format(p_report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    commands = {"odds": _cmd_odds, "assign": _cmd_assign, "draw": _cmd_draw, "design": _cmd_design,
+                "orders": _cmd_orders, "audit": _cmd_audit, "report": _cmd_report}
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        teams_dict = None
+        if args.command not in ("audit", "report"):
+            teams_dict = read_teams(args.teams_file)
+            if len(teams_dict) < 2:
+                raise ValueError("Please provide at least two teams.")
+        rows, header = commands[args.command](args, teams_dict, out)
+        if rows is not None:
+            _write(rows, header, args.format == "json", out)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
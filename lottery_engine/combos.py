@@ -0,0 +1,269 @@
+# lottery_engine/combos.py
+"""Ball combinations: combinadic ranking and assignment of combinations to teams."""
+import bisect
+import math
+
+import numpy as np
+
+from . import metrics
+
+# Default ping-pong ball setup (NBA): DRAWN balls out of BALLS, one
+# combination per ticket, LOTTERY_TICKETS of the COMBO_COUNT combinations
+# assigned and the rest redrawn.
+BALLS = 14
+DRAWN = 4
+COMBO_COUNT = math.comb(BALLS, DRAWN)  # 1001
+LOTTERY_TICKETS = 1000
+
+_MASK64 = (1 << 64) - 1
+
+
+def combo_rank(numbers, balls=BALLS, drawn=DRAWN):
+    """
+    Rank of a draw in the combinatorial number system (0..comb(balls, drawn)-1).
+
+    Order of the numbers does not matter; raises ValueError for duplicates or
+    numbers outside 1..balls.
+    """
+    picked = sorted(int(x) for x in numbers)
+    if len(picked) != drawn or len(set(picked)) != drawn or picked[0] < 1 or picked[-1] > balls:
+        raise ValueError(f"A draw needs {drawn} different numbers between 1 and {balls}.")
+    return sum(math.comb(b - 1, i) for i, b in enumerate(picked, start=1))
+
+
+def combo_unrank(rank, balls=BALLS, drawn=DRAWN):
+    """Inverse of combo_rank: sorted tuple of ball numbers for a rank."""
+    if not 0 <= rank < math.comb(balls, drawn):
+        raise ValueError(f"Combination rank must be between 0 and {math.comb(balls, drawn) - 1}.")
+    picked = []
+    for i in range(drawn, 0, -1):
+        b = i
+        while math.comb(b, i) <= rank:
+            b += 1
+        rank -= math.comb(b - 1, i)
+        picked.append(b)
+    return tuple(reversed(picked))
+
+
+def combo_unrank_many(ranks, balls=BALLS, drawn=DRAWN):
+    """Vectorized combo_unrank: (len(ranks), drawn) int array of sorted ball numbers."""
+    table = np.array([[math.comb(b, i) for i in range(drawn + 1)] for b in range(balls + 1)], dtype=np.int64)
+    rest = np.asarray(ranks, dtype=np.int64).copy()
+    out = np.empty((len(rest), drawn), dtype=np.int64)
+    for i in range(drawn, 0, -1):
+        b = np.searchsorted(table[:, i], rest, side="right") - 1  # largest b with comb(b, i) <= rest
+        rest -= table[b, i]
+        out[:, i - 1] = b + 1
+    return out
+
+
+def combo_rank_many(numbers, balls=BALLS, drawn=DRAWN):
+    """Vectorized combo_rank: rank of every row of an (n, drawn) int array of ball numbers (any order)."""
+    picked = np.sort(np.asarray(numbers, dtype=np.int64).reshape(-1, drawn), axis=1)
+    if len(picked) and (picked[:, 0].min() < 1 or picked[:, -1].max() > balls or (np.diff(picked, axis=1) == 0).any()):
+        raise ValueError(f"A draw needs {drawn} different numbers between 1 and {balls}.")
+    table = np.array([[math.comb(b, i) for i in range(drawn + 1)] for b in range(balls + 1)], dtype=np.int64)
+    ranks = np.zeros(len(picked), dtype=np.int64)
+    for i in range(1, drawn + 1):
+        ranks += table[picked[:, i - 1] - 1, i]
+    return ranks
+
+
+def combo_label(rank, balls=BALLS, drawn=DRAWN):
+    """Display/CSV form of a combination, e.g. '1 5 9 13'."""
+    return " ".join(map(str, combo_unrank(rank, balls, drawn)))
+
+
+def generate_all_combinations(balls=BALLS, drawn=DRAWN):
+    """All drawn-of-balls combinations as display strings, indexed by rank (small pools only)."""
+    return [" ".join(map(str, row)) for row in combo_unrank_many(np.arange(math.comb(balls, drawn)), balls, drawn)]
+
+
+def _splitmix64(x):
+    """splitmix64 finalizer on a uint64 array (wrapping arithmetic)."""
+    x = (x + np.uint64(0x9E3779B97F4A7C15)) & np.uint64(_MASK64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _splitmix64_int(x):
+    """Scalar twin of _splitmix64 on Python ints (same results, no array overhead)."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class _FeistelPermutation:
+    """
+    Seeded bijection of 0..n-1 without a lookup table.
+
+    A 4-round balanced Feistel network on the smallest even bit width
+    covering n, with cycle walking to stay inside the domain (fewer than 4
+    steps on average). Memory is O(1) whatever n is.
+    """
+
+    __slots__ = ("n", "half", "half_mask", "keys", "_int_keys")
+
+    def __init__(self, n, seed):
+        self.n = int(n)
+        self.half = max(1, (max(1, self.n - 1).bit_length() + 1) // 2)
+        self.half_mask = np.uint64((1 << self.half) - 1)
+        self.keys = np.random.default_rng(seed).integers(0, 2 ** 63, size=4, dtype=np.uint64)
+        self._int_keys = [int(k) for k in self.keys]
+
+    def _rounds(self, x, keys, inverse):
+        shift = np.uint64(self.half)
+        left, right = x >> shift, x & self.half_mask
+        with np.errstate(over="ignore"):
+            for key in keys:
+                if inverse:
+                    left, right = right ^ (_splitmix64(left ^ key) & self.half_mask), left
+                else:
+                    left, right = right, left ^ (_splitmix64(right ^ key) & self.half_mask)
+        return (left << shift) | right
+
+    def _walk(self, values, inverse):
+        x = np.asarray(values, dtype=np.uint64).copy()
+        keys = self.keys[::-1] if inverse else self.keys
+        todo = np.ones(len(x), dtype=bool)
+        while todo.any():
+            x[todo] = self._rounds(x[todo], keys, inverse)
+            todo = x >= np.uint64(self.n)
+        return x.astype(np.int64)
+
+    def forward(self, values):
+        return self._walk(values, inverse=False)
+
+    def inverse(self, values):
+        return self._walk(values, inverse=True)
+
+    def _walk_one(self, x, inverse):
+        keys = self._int_keys[::-1] if inverse else self._int_keys
+        half, mask = self.half, int(self.half_mask)
+        while True:
+            left, right = x >> half, x & mask
+            for key in keys:
+                if inverse:
+                    left, right = right ^ (_splitmix64_int(left ^ key) & mask), left
+                else:
+                    left, right = right, left ^ (_splitmix64_int(right ^ key) & mask)
+            x = (left << half) | right
+            if x < self.n:
+                return x
+
+    def forward_one(self, value):
+        return self._walk_one(int(value), inverse=False)
+
+    def inverse_one(self, value):
+        return self._walk_one(int(value), inverse=True)
+
+
+class ComboAssignment:
+    """
+    Assignment of a drawn-of-balls combination pool to teams by ticket count.
+
+    Combinations are shuffled by a seeded permutation of their ranks; team t
+    owns permuted positions [start[t], start[t] + tickets[t]) and positions
+    past the ticket total are unassigned (redrawn if they come up). Memory
+    and lookups grow with the number of teams, not with the pool size.
+    """
+
+    __slots__ = ("balls", "drawn", "size", "tickets", "total", "start", "_start_list", "_perm")
+
+    def __init__(self, tickets, balls=BALLS, drawn=DRAWN, seed=None):
+        self.balls = int(balls)
+        self.drawn = int(drawn)
+        self.size = math.comb(self.balls, self.drawn)
+        self.tickets = np.asarray(tickets, dtype=np.int64)
+        self.total = int(self.tickets.sum())
+        self.start = np.concatenate(([0], np.cumsum(self.tickets)))
+        self._start_list = self.start.tolist()
+        self._perm = _FeistelPermutation(self.size, seed)
+
+    def owners(self, ranks):
+        """Team id per combination rank (-1 = unassigned)."""
+        positions = self._perm.forward(np.asarray(ranks, dtype=np.int64))
+        team = np.searchsorted(self.start, positions, side="right") - 1
+        return np.where(positions < self.total, team, -1)
+
+    def __getitem__(self, rank):
+        position = self._perm.forward_one(rank)
+        if position >= self.total:
+            return -1
+        return bisect.bisect_right(self._start_list, position) - 1
+
+    def ranks(self, team_id, offsets):
+        """Combination ranks of the given ticket offsets (0..tickets-1) of a team."""
+        return self._perm.inverse(self.start[team_id] + np.asarray(offsets, dtype=np.int64))
+
+    def rank(self, team_id, offset):
+        return self._perm.inverse_one(int(self.start[team_id]) + int(offset))
+
+    def label(self, rank):
+        return combo_label(rank, self.balls, self.drawn)
+
+    def iter_chunks(self, chunk=65536):
+        """Yield (ranks, team ids) for every assigned combination, team by team, in bounded chunks."""
+        for pos in range(0, self.total, chunk):
+            positions = np.arange(pos, min(pos + chunk, self.total), dtype=np.int64)
+            yield self._perm.inverse(positions), np.searchsorted(self.start, positions, side="right") - 1
+
+
+@metrics.timed("assign")
+def assign_combinations_to_teams(teams_dict, seed=None, balls=BALLS, drawn=DRAWN):
+    """
+    Randomly assign combinations of the drawn-of-balls pool to teams by ticket count.
+
+    Any ticket total up to the pool size is allowed; the remaining
+    combinations stay unassigned. Returns a ComboAssignment (index it with a
+    rank to get the team id, -1 if unassigned).
+    """
+    tickets = list(teams_dict.values())
+    pool = math.comb(balls, drawn)
+    if min(tickets, default=0) < 1:
+        raise ValueError("Every team needs at least one ticket!")
+    if sum(tickets) > pool:
+        raise ValueError(f"Total tickets ({sum(tickets)}) exceed the {pool} combinations of {drawn} out of {balls} balls!")
+    return ComboAssignment(tickets, balls, drawn, seed)
+
+
+def _label_rows(assignment, ranks):
+    return [" ".join(map(str, row)) for row in combo_unrank_many(ranks, assignment.balls, assignment.drawn)]
+
+
+def assignment_frame(assignment, teams, limit=None, rng=None):
+    """
+    Combination/Team DataFrame for display: every assigned combination, or
+    a random sample of `limit` of them (without building the rest).
+    """
+    import pandas as pd
+
+    names = list(teams)
+    if limit is not None and limit < assignment.total:
+        rng = np.random.default_rng() if rng is None else rng
+        positions = np.sort(rng.choice(assignment.total, size=limit, replace=False))
+        team_ids = np.searchsorted(assignment.start, positions, side="right") - 1
+        ranks = assignment._perm.inverse(positions)
+    else:
+        parts = list(assignment.iter_chunks())
+        ranks = np.concatenate([r for r, _ in parts]) if parts else np.empty(0, dtype=np.int64)
+        team_ids = np.concatenate([t for _, t in parts]) if parts else np.empty(0, dtype=np.int64)
+    return pd.DataFrame({"Combination": _label_rows(assignment, ranks), "Team": [names[t] for t in team_ids]})
+
+
+def iter_assignment_csv(assignment, teams, chunk=65536):
+    """Stream the assignment CSV (Combination,Team) as text chunks."""
+    names = list(teams)
+    yield "Combination,Team\n"
+    for ranks, team_ids in assignment.iter_chunks(chunk):
+        labels = _label_rows(assignment, ranks)
+        yield "".join(f"{label},{_csv_field(names[t])}\n" for label, t in zip(labels, team_ids))
+
+
+def _csv_field(value):
+    value = str(value)
+    if any(c in value for c in ',"\n\r'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
@@ -0,0 +1,134 @@
+# lottery_engine/design.py
+"""Ticket-table design: candidate ticket curves and an inverse solver for target odds."""
+import numpy as np
+
+from .odds import EXACT_MAX_STATES, _exact_state_count, sweep_odds
+
+
+def ticket_curves(n_teams, total, flat_top, ratios):
+    """
+    Integer ticket vectors (one row per ratio) for a flat-top, geometric-decay curve.
+
+    The worst `flat_top` teams share the top ticket count, every later team
+    gets `ratio` times the one before. Each team keeps at least one ticket,
+    rows are non-increasing and sum to `total` (largest-remainder rounding).
+    """
+    ratios = np.atleast_1d(np.asarray(ratios, dtype=np.float64))
+    steps = np.maximum(np.arange(n_teams) - flat_top + 1, 0)
+    raw = ratios[:, None] ** steps[None, :]
+    share = raw / raw.sum(axis=1, keepdims=True) * (total - n_teams)
+    tickets = np.floor(share).astype(np.int64)
+    short = total - n_teams - tickets.sum(axis=1)
+    rank = np.argsort(-(share - tickets), axis=1, kind="stable")
+    extra = (np.arange(n_teams)[None, :] < short[:, None]).astype(np.int64)
+    np.put_along_axis(tickets, rank, np.take_along_axis(tickets, rank, axis=1) + extra, axis=1)
+    return -np.sort(-(tickets + 1), axis=1)
+
+
+def drop_probabilities(probs, max_drop):
+    """
+    P(team ends more than max_drop spots below its seed) from a (..., teams x picks) tensor.
+
+    Teams are seeded in row order (row 0 = seed 1 = most tickets). Picks not
+    in the tensor count as drops, so pass all picks for exact numbers.
+    """
+    n_teams, picks = probs.shape[-2:]
+    limit = np.minimum(np.arange(n_teams) + 1 + max_drop, picks)  # last pick still within range
+    within = np.arange(picks)[None, :] < limit[:, None]
+    return 1 - (probs * within).sum(axis=-1)
+
+
+def _entropy(tickets):
+    share = tickets / tickets.sum(axis=-1, keepdims=True)
+    return -(share * np.log(share)).sum(axis=-1)
+
+
+def solve_tickets(n_teams, total, worst_pick1=None, max_drop=None, max_drop_prob=0.01, max_flat_top=4,
+                  engine="auto", n_simulations=20000, seed=0, grid=16, steps=10):
+    """
+    Flattest ticket table that meets the target odds.
+
+    Targets: the worst team (seed 1) lands pick 1 with at least `worst_pick1`
+    (probability units) and no team ends more than `max_drop` spots below
+    its seed with probability above `max_drop_prob` (every pick is drawn,
+    so any drop has some chance; the bound makes the target reachable).
+
+    Candidates are ticket_curves with flat-top widths 1..max_flat_top. One
+    sweep_odds call scores a grid of decay ratios for every width; the
+    largest feasible ratio per width is then refined by bisection against
+    the next grid point, all widths sharing each sweep. (Drop odds are not
+    monotone in the ratio: a very steep curve leaves many one-ticket teams
+    that shuffle among themselves, hence the grid first.) The winner is the
+    feasible table with the most even ticket spread (highest entropy),
+    checked after rounding to integers; if nothing is feasible it is the
+    candidate that misses the targets by the least.
+
+    Returns (tickets, probs, info): tickets is a non-increasing int array
+    summing to `total` in seed order, probs its (teams x teams) odds, info
+    has 'feasible', 'flat_top', 'ratio', 'engine', 'worst_pick1' and
+    'max_drop_prob' (achieved values). engine 'auto' is exact only while
+    a whole sweep fits the budget of one exact odds table
+    (EXACT_MAX_STATES), else Monte-Carlo.
+    """
+    n_teams, total = int(n_teams), int(total)
+    if n_teams < 2:
+        raise ValueError("Please provide at least two teams.")
+    if total < n_teams:
+        raise ValueError(f"Total tickets ({total}) must give every team at least one ticket.")
+    widths = np.arange(1, min(max_flat_top, n_teams) + 1)
+    if engine == "auto":
+        # every sweep scores len(widths) * grid candidates, so the exact budget of one odds table is split among them
+        exact = _exact_state_count(n_teams, n_teams) * len(widths) * grid <= EXACT_MAX_STATES
+        engine = "exact" if exact else "monte_carlo"
+
+    def curves(width_ratios):
+        return np.concatenate([ticket_curves(n_teams, total, k, r) for k, r in zip(widths, width_ratios)])
+
+    def evaluate(tickets):
+        """(shortfall per candidate, probs); shortfall 0 means every target is met."""
+        probs = sweep_odds(tickets, engine=engine, n_simulations=n_simulations, seed=seed)
+        shortfall = np.zeros(len(tickets))
+        if worst_pick1 is not None:
+            shortfall += np.maximum(worst_pick1 - probs[:, 0, 0], 0)
+        if max_drop is not None:
+            shortfall += np.maximum(drop_probabilities(probs, max_drop).max(axis=1) - max_drop_prob, 0)
+        return shortfall, probs
+
+    # ratio 0: the top teams hold every spare ticket; ratio 1: flat
+    ratios = np.linspace(0, 1, grid)
+    shortfall, _ = evaluate(curves([ratios] * len(widths)))
+    ok = (shortfall == 0).reshape(len(widths), grid)
+    if ok.any():
+        last = np.where(ok.any(axis=1), grid - 1 - np.argmax(ok[:, ::-1], axis=1), 0)
+        lo = ratios[last]
+        hi = ratios[np.minimum(last + 1, grid - 1)]
+        for _ in range(steps):
+            mid = (lo + hi) / 2
+            mid_short, _ = evaluate(curves(mid[:, None]))
+            lo = np.where(mid_short == 0, mid, lo)
+            hi = np.where(mid_short == 0, hi, mid)
+        best_ratio = np.where(ok.any(axis=1), lo, 0.0)
+    else:
+        best_ratio = ratios[np.argmin(shortfall.reshape(len(widths), grid), axis=1)]
+    candidates = curves(best_ratio[:, None])
+    shortfall, probs = evaluate(candidates)
+    feasible = shortfall == 0
+    best = int(np.argmax(np.where(feasible, _entropy(candidates), -np.inf))) if feasible.any() \
+        else int(np.argmin(shortfall))
+    info = {
+        "feasible": bool(feasible[best]),
+        "flat_top": int(widths[best]),
+        "ratio": float(best_ratio[best]),
+        "engine": engine,
+        "worst_pick1": float(probs[best, 0, 0]),
+        "max_drop_prob": None if max_drop is None else float(drop_probabilities(probs[best], max_drop).max()),
+    }
+    return candidates[best], probs[best], info
+
+
+def tickets_by_seed(teams_dict, tickets):
+    """Hand a seed-ordered ticket vector to teams, seeded by their current tickets (ties keep input order)."""
+    names = list(teams_dict)
+    current = np.asarray([teams_dict[t] for t in names])
+    order = np.argsort(-current, kind="stable")
+    return {names[i]: int(t) for i, t in sorted(zip(order, tickets))}
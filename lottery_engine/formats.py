@@ -0,0 +1,376 @@
+# lottery_engine/formats.py
+"""
+Lottery formats: how many picks are drawn, maximum drop and protected slots.
+
+Every format is run on teams in seed order (seed 1 = most tickets). Pick p
+goes, in order of precedence,
+
+1. to the team seeded p if seed p is protected (it is never in the draw);
+2. to the best-seeded team still waiting if it would otherwise fall more
+   than max_drop spots below its seed, or if p is past the lottery picks;
+3. otherwise to a weighted draw among the teams still waiting.
+
+The engines below work on the "reduced" league without protected teams
+and slots: M teams, slot ranks 0..M-1, the first L slot ranks drawn and a
+deadline (last allowed slot rank) per team. A slot is forced when some
+deadline could not be met otherwise, i.e. when the teams due by slot q
+already need every slot from now to q; serving the best-seeded waiting
+team then meets every deadline.
+"""
+import math
+
+import numpy as np
+
+
+class LotteryFormat:
+    """
+    Draft lottery rules.
+
+    lottery_picks: picks 1..K are drawn (None = every pick, the full draw);
+    the rest go by seed. max_drop: no team ends more than this many spots
+    below its seed (None = no limit). protected: seeds (1-based) that keep
+    their own pick and stay out of the draw.
+    """
+
+    def __init__(self, lottery_picks=None, max_drop=None, protected=()):
+        self.lottery_picks = None if lottery_picks is None else int(lottery_picks)
+        self.max_drop = None if max_drop is None else int(max_drop)
+        self.protected = tuple(sorted({int(s) for s in protected}))
+        if self.lottery_picks is not None and self.lottery_picks < 0:
+            raise ValueError("The number of lottery picks cannot be negative.")
+        if self.max_drop is not None and self.max_drop < 0:
+            raise ValueError("The maximum drop cannot be negative.")
+        if any(s < 1 for s in self.protected):
+            raise ValueError("Protected seeds start at 1.")
+
+    def __repr__(self):
+        return (f"LotteryFormat(lottery_picks={self.lottery_picks}, max_drop={self.max_drop}, "
+                f"protected={self.protected})")
+
+    def __eq__(self, other):
+        return isinstance(other, LotteryFormat) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def key(self):
+        return self.lottery_picks, self.max_drop, self.protected
+
+    def is_full_draw(self, n_teams):
+        """True when every pick is drawn with no constraint (the engines' original fast paths)."""
+        return ((self.lottery_picks is None or self.lottery_picks >= n_teams)
+                and (self.max_drop is None or self.max_drop >= n_teams - 1)
+                and not any(s <= n_teams for s in self.protected))
+
+    def describe(self):
+        parts = ["every pick drawn" if self.lottery_picks is None else f"top {self.lottery_picks} picks drawn"]
+        if self.max_drop is not None:
+            parts.append(f"max drop {self.max_drop}")
+        if self.protected:
+            parts.append("protected seeds " + ", ".join(map(str, self.protected)))
+        return ", ".join(parts)
+
+    def plan(self, n_teams):
+        """FormatPlan of this format for n_teams teams."""
+        return FormatPlan(self, n_teams)
+
+
+FULL_DRAW = LotteryFormat()
+
+
+def as_format(fmt):
+    """None means the full draw."""
+    return FULL_DRAW if fmt is None else fmt
+
+
+class FormatPlan:
+    """
+    A format laid out for a league size, in seed order.
+
+    protected: bool per seed index; free: seed indices in the draw (the
+    reduced teams, best seed first); slots: 0-based pick of each reduced
+    slot rank; lottery: number of drawn slot ranks (L); deadline: last slot
+    rank per reduced team (non-decreasing; M - 1 means no limit).
+    """
+
+    def __init__(self, fmt, n_teams):
+        self.n_teams = n_teams
+        self.protected = np.zeros(n_teams, dtype=bool)
+        for s in fmt.protected:
+            if s <= n_teams:
+                self.protected[s - 1] = True
+        self.free = np.flatnonzero(~self.protected)
+        self.slots = self.free.copy()  # protected seed s keeps pick s, so free picks == free seeds
+        n_free = len(self.free)
+        k = n_teams if fmt.lottery_picks is None else min(fmt.lottery_picks, n_teams)
+        self.lottery = int(np.searchsorted(self.slots, k))  # free picks among picks 1..K
+        deadline = np.full(n_free, n_free - 1)
+        if fmt.max_drop is not None:
+            # last free pick at or before seed + max_drop, as a slot rank
+            latest = np.minimum(self.free + fmt.max_drop, n_teams - 1)
+            deadline = np.maximum(np.searchsorted(self.slots, latest, side="right") - 1, np.arange(n_free))
+        self.deadline = deadline
+
+    def must_serve(self, waiting, k):
+        """
+        Per row of a (rows x M) waiting mask: must slot rank k go to the best-seeded waiting team?
+
+        True when for some q >= k the waiting teams due by q fill every slot
+        from k to q (the last slot rank is no constraint: it always fits).
+        """
+        n = waiting.shape[1]
+        limited = self.deadline < n - 1
+        if k >= n - 1 or not limited.any():
+            return np.zeros(len(waiting), dtype=bool)
+        q = np.arange(k, n - 1)
+        due = (self.deadline[limited][:, None] <= q[None, :]).astype(np.int64)  # team x q
+        need = waiting[:, limited].astype(np.int64) @ due
+        return (need >= q - k + 1).any(axis=1)
+
+    def expand(self, reduced_probs, offset=0, fill=1.0):
+        """
+        (..., M x M') slot-rank odds -> (..., T x T) pick odds in seed order.
+
+        offset: slot ranks already placed (the first column of reduced_probs);
+        fill: value of each protected team's own pick (1, or the run count for sums).
+        """
+        shape = reduced_probs.shape[:-2] + (self.n_teams, self.n_teams)
+        probs = np.zeros(shape)
+        for s in np.flatnonzero(self.protected):
+            probs[..., s, s] = fill
+        cols = self.slots[offset:offset + reduced_probs.shape[-1]]
+        probs[..., self.free[:, None], cols[None, :]] = reduced_probs
+        return probs
+
+
+def _lowest_open(masks, n):
+    """Index of the lowest zero bit of each mask (n when all n bits are set)."""
+    free = ~masks & (masks + 1)
+    return np.where(free >= (1 << n), n, np.log2(np.maximum(free, 1)).astype(np.int64))
+
+
+def format_exact_probs_batch(weights, plan, prefix=()):
+    """
+    Exact (candidates x M x M) slot-rank odds of the reduced league for a (candidates x M) weight matrix.
+
+    Same layered recursion as odds._exact_pick_probs_batch, with forced
+    picks (deadline reached or past the lottery) moving a state's mass to
+    its best-seeded waiting team without a draw. The recursion stops after
+    the lottery slots; each final set fills the rest in seed order. prefix
+    lists the reduced teams already placed (slot ranks 0..len-1); their
+    columns are left at zero.
+    """
+    weights = np.atleast_2d(weights)
+    n_candidates, n = weights.shape
+    probs = np.zeros((n_candidates, n, n))
+    start = len(prefix)
+    mask0 = 0
+    for r in prefix:
+        mask0 |= 1 << int(r)
+    masks = np.array([mask0], dtype=np.int64)
+    mass = np.ones((n_candidates, 1))
+    removed = weights[:, list(prefix)].sum(axis=1, keepdims=True)
+    total = weights.sum(axis=1)
+    for k in range(start, plan.lottery):
+        next_masks, next_mass, next_removed = [], [], []
+        first = _lowest_open(masks, n)
+        if (first >= n).all():
+            break
+        waiting = ((masks[:, None] >> np.arange(n, dtype=np.int64)) & 1) == 0
+        forced = (first < n) & plan.must_serve(waiting, k)
+        if forced.any():
+            f = np.flatnonzero(forced)
+            team = first[f]
+            np.add.at(probs[:, :, k], (slice(None), team), mass[:, f])
+            next_masks.append(masks[f] | (np.int64(1) << team))
+            next_mass.append(mass[:, f])
+            next_removed.append(removed[:, f] + weights[:, team])
+        draw = np.flatnonzero(~forced & (first < n))
+        if len(draw):
+            share = mass[:, draw] / (total[:, None] - removed[:, draw])
+            for j in range(n):
+                bit = np.int64(1) << j
+                open_ = draw[(masks[draw] & bit) == 0]
+                if not len(open_):
+                    continue
+                p = share[:, np.searchsorted(draw, open_)] * weights[:, j, None]
+                probs[:, j, k] += p.sum(axis=1)
+                next_masks.append(masks[open_] | bit)
+                next_mass.append(p)
+                next_removed.append(removed[:, open_] + weights[:, j, None])
+        masks, first_idx, inverse = np.unique(np.concatenate(next_masks), return_index=True, return_inverse=True)
+        flat_mass = np.concatenate(next_mass, axis=1)
+        mass = np.stack([np.bincount(inverse, weights=row, minlength=len(masks)) for row in flat_mass])
+        removed = np.concatenate(next_removed, axis=1)[:, first_idx]
+    # everyone still waiting goes in seed order into the remaining slot ranks
+    placed = np.array([bin(int(m)).count("1") for m in masks], dtype=np.int64)
+    rank = placed.copy()
+    for j in range(n):
+        open_ = (masks & (np.int64(1) << j)) == 0
+        if not open_.any():
+            continue
+        slot = rank[open_]
+        for c in range(n_candidates):
+            probs[c, j] += np.bincount(slot, weights=mass[c, open_], minlength=n)[:n]
+        rank[open_] += 1
+    return probs
+
+
+def _fill_hits(placed, n):
+    """
+    (M x M) hit counts of the seed-order fill, given the (runs x P) reduced teams placed before it.
+
+    Every waiting team j lands on slot rank P + j - c, with c the number of
+    placed teams seeded above it. Between two consecutive placed seeds c is
+    constant, so each run adds one diagonal run of hits per gap; a
+    difference array over (c, j) counts them all in O(runs x P).
+    """
+    size, n_placed = placed.shape
+    bounds = np.sort(placed, axis=1)
+    lo = np.concatenate([np.full((size, 1), -1), bounds], axis=1) + 1  # first waiting seed of gap c
+    hi = np.concatenate([bounds, np.full((size, 1), n)], axis=1)  # end (exclusive) of gap c
+    gap = np.arange(n_placed + 1) * (n + 1)
+    diff = (np.bincount((gap + lo).ravel(), minlength=(n_placed + 1) * (n + 1))
+            - np.bincount((gap + hi).ravel(), minlength=(n_placed + 1) * (n + 1)))
+    runs = np.cumsum(diff.reshape(n_placed + 1, n + 1), axis=1)[:, :n]
+    hits = np.zeros((n, n))
+    c, j = np.nonzero(runs)
+    hits[j, n_placed + j - c] = runs[c, j]  # distinct (c, j) give distinct cells
+    return hits
+
+
+def _draw_waiting(cumulative, waiting, rng, rounds=8):
+    """
+    One weighted draw among each row's waiting teams.
+
+    Draws a ticket from the whole pool and redraws the rows whose ticket
+    belongs to a placed team, like a redrawn combination in the ceremony;
+    rows still unlucky after `rounds` tries use an exact per-row inverse CDF.
+    """
+    size, n = waiting.shape
+    rows = np.arange(size)
+    team = np.empty(size, dtype=np.int64)
+    todo = rows
+    for _ in range(rounds):
+        pick = np.searchsorted(cumulative, rng.random(len(todo)) * cumulative[-1], side="right")
+        ok = waiting[todo, pick]
+        team[todo[ok]] = pick[ok]
+        todo = todo[~ok]
+        if not len(todo):
+            return team
+    weights = np.diff(cumulative, prepend=0.0)
+    left = np.cumsum(np.where(waiting[todo], weights, 0.0), axis=1)
+    u = rng.random(len(todo)) * left[:, -1]
+    team[todo] = (left <= u[:, None]).sum(axis=1)
+    return team
+
+
+def _draw_lottery(weights, plan, size, rng, prefix=(), on_slot=None):
+    """
+    Simulate the lottery slots of `size` runs of the reduced league; returns the (size x P) placed teams.
+
+    Columns are slot ranks 0..P-1 (the prefix, then one per lottery slot),
+    P = max(lottery, len(prefix)). on_slot(k, team, forced, waiting, left)
+    sees every simulated slot before its teams leave the pool.
+    """
+    n = len(weights)
+    cumulative = np.cumsum(weights)
+    prefix = list(prefix)
+    rows = np.arange(size)
+    waiting = np.ones((size, n), dtype=bool)
+    waiting[:, prefix] = False
+    left = np.full(size, weights.sum() - weights[prefix].sum())
+    placed = np.empty((size, max(plan.lottery, len(prefix))), dtype=np.int64)
+    placed[:, :len(prefix)] = prefix
+    for k in range(len(prefix), plan.lottery):
+        forced = plan.must_serve(waiting, k)
+        team = np.empty(size, dtype=np.int64)
+        team[forced] = np.argmax(waiting[forced], axis=1)
+        team[~forced] = _draw_waiting(cumulative, waiting[~forced], rng)
+        if on_slot is not None:
+            on_slot(k, team, forced, waiting, left)
+        placed[:, k] = team
+        waiting[rows, team] = False
+        left -= weights[team]
+    return placed
+
+
+def format_pick_sums(weights, plan, n_simulations, rng, rao_blackwell=False, prefix=(), batch_cells=1_000_000):
+    """
+    Monte-Carlo (sums, squares) of slot-rank odds for the reduced league, each (M x M).
+
+    Only the lottery slots are simulated, one weighted draw per slot (see
+    _draw_waiting); the seed-order fill of the rest is counted in closed
+    form (_fill_hits), so a run costs O(lottery picks) draws and no sort.
+    With rao_blackwell each drawn slot scores every waiting team's
+    conditional chance, tickets / tickets left, instead of the 0/1 hit (see
+    odds._rb_pick_sums); otherwise sums are hit counts (and squares equal
+    them). Forced and filled picks are certain either way.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+    sums = np.zeros((n, n))
+    squares = np.zeros((n, n))
+
+    def _score(k, team, forced, waiting, left):
+        if rao_blackwell:
+            # sum over runs of waiting * w / left, and of its square
+            drawn = ~forced
+            inv = 1.0 / left[drawn]
+            sums[:, k] += weights * (inv @ waiting[drawn])
+            squares[:, k] += weights ** 2 * ((inv * inv) @ waiting[drawn])
+            certain = np.bincount(team[forced], minlength=n)
+        else:
+            certain = np.bincount(team, minlength=n)
+        sums[:, k] += certain
+        squares[:, k] += certain
+
+    batch = max(1, batch_cells // n)
+    done = 0
+    while done < n_simulations:
+        size = min(batch, n_simulations - done)
+        fill = _fill_hits(_draw_lottery(weights, plan, size, rng, prefix, _score), n)
+        sums += fill
+        squares += fill
+        done += size
+    if prefix:
+        sums[:, :len(prefix)] = squares[:, :len(prefix)] = 0.0  # placed slot ranks are not estimated
+    return sums, squares
+
+
+def format_orders(weights, plan, size, rng):
+    """
+    (size x T) seed index at each pick for `size` simulated runs of a format (weights in seed order).
+
+    Uses the same draws as format_pick_sums, so a generator in the same
+    state gives the orders behind its counts.
+    """
+    reduced = reduced_weights(weights, plan)
+    n = len(reduced)
+    placed = _draw_lottery(reduced, plan, size, rng)
+    waiting = np.ones((size, n), dtype=bool)
+    waiting[np.arange(size)[:, None], placed] = False
+    rest = np.nonzero(waiting)[1].reshape(size, n - placed.shape[1])  # row-major: seed order per run
+    ranks = np.concatenate([placed, rest], axis=1)
+    orders = np.empty((size, plan.n_teams), dtype=np.int64)
+    orders[:, plan.slots] = plan.free[ranks]
+    protected = np.flatnonzero(plan.protected)
+    orders[:, protected] = protected
+    return orders
+
+
+def reduced_weights(weights, plan):
+    """Seed-ordered weights of the teams in the draw."""
+    return np.asarray(weights, dtype=np.float64)[..., plan.free]
+
+
+def reduced_prefix(plan, placed_seeds):
+    """Slot-rank prefix (reduced team indices) from the seed indices placed so far, in pick order."""
+    rank_of = {int(s): r for r, s in enumerate(plan.free)}
+    return tuple(rank_of[int(s)] for s in placed_seeds if int(s) in rank_of)
+
+
+def format_state_count(plan):
+    """Sets of drawn teams the exact format recursion can reach."""
+    n = len(plan.free)
+    return sum(math.comb(n, k) for k in range(min(plan.lottery, n) + 1))
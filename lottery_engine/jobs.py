@@ -0,0 +1,215 @@
+# lottery_engine/jobs.py
+"""Background odds jobs on a bounded thread pool, shared by every session of the app."""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import metrics
+from .cache import OddsCache
+from .odds import OddsTable, default_workers, odds_matrix
+
+QUEUED, RUNNING, DONE, CANCELLED, FAILED = "queued", "running", "done", "cancelled", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback to stop it between rounds."""
+
+
+class OddsJob:
+    """
+    One odds computation. Read its fields freely; they are only written by the scheduler.
+
+    `partial` holds the running Monte-Carlo estimate (teams, probs,
+    half_width) and `result` the final odds_matrix tuple once done.
+    """
+
+    def __init__(self, job_id, key, teams_dict, kwargs):
+        self.id = job_id
+        self.key = key
+        self.teams_dict = dict(teams_dict)
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.sessions = set()
+        self.runs_done = 0
+        self.max_half_width = None  # widest 95% CI so far, percentage points
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+        self.metrics = None  # registry of the submitting session, recorded into on the job thread
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+    def odds(self):
+        """OddsTable of the final odds, or of the running estimate while the job is active (None before)."""
+        source = self.result if self.result is not None else self.partial
+        if source is None:
+            return None
+        return OddsTable(*source[:3], engine=self.kwargs["engine"])
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobScheduler:
+    """
+    Runs odds_matrix calls on a bounded pool so long simulations do not block the UI.
+
+    Identical in-flight requests (same sorted tickets, picks, engine, runs,
+    seed, precision and lottery format, i.e. the odds-cache key) share one job; each
+    session may have at most max_per_session active jobs. A job is
+    cancelled once every session that asked for it has cancelled; a running
+    Monte-Carlo job stops at the end of its current round. Finished jobs
+    are kept for `keep_finished` seconds so slow pollers still see them.
+
+    Parallel jobs (workers > 1) share one process pool of max_jobs
+    workers, started with the first of them: however many jobs run at
+    once, the scheduler never has more than max_jobs simulation processes.
+    """
+
+    def __init__(self, max_jobs=None, max_per_session=1, cache=None, keep_finished=600):
+        self.max_jobs = max(1, int(max_jobs or default_workers()))
+        self.max_per_session = int(max_per_session)
+        self.cache = cache
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="odds-job")
+        self._processes = None  # shared simulation pool, see _process_pool
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._inflight = {}  # cache key -> active job
+        self._ids = itertools.count(1)
+
+    def submit(self, session_id, teams_dict, engine, picks=None, n_simulations=10000, seed=None,
+               precision=None, workers=1, fmt=None):
+        """
+        Queue an odds job for a session and return it (an identical active job is reused).
+
+        Raises ValueError when the session already has max_per_session active jobs.
+        """
+        tickets = np.sort(np.asarray(list(teams_dict.values()), dtype=np.float64))[::-1]
+        n_picks = len(teams_dict) if picks is None else min(int(picks), len(teams_dict))
+        key = OddsCache.key(tickets, n_picks, engine, n_simulations, seed, precision,
+                            fmt=None if fmt is None or fmt.is_full_draw(len(tickets)) else fmt.key())
+        # the team names only label the rows, so they are part of what gets shared
+        key = (key, tuple(teams_dict))
+        with self._lock:
+            self._expire()
+            job = self._inflight.get(key)
+            if job is not None and session_id in job.sessions:
+                return job
+            active = sum(1 for j in self._jobs.values() if j.active and session_id in j.sessions)
+            if active >= self.max_per_session:
+                raise ValueError(f"You already have {active} odds job(s) running; wait or cancel first.")
+            if job is None:
+                kwargs = {"picks": n_picks, "n_simulations": n_simulations, "seed": seed, "precision": precision,
+                          "workers": max(1, min(int(workers), self.max_jobs)), "fmt": fmt}
+                job = OddsJob(next(self._ids), key, teams_dict, dict(kwargs, engine=engine))
+                job.metrics = metrics.current()
+                self._jobs[job.id] = job
+                self._inflight[key] = job
+                self._pool.submit(self._run, job)
+            job.sessions.add(session_id)
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, session_id):
+        """Detach a session from a job; the job itself stops when no session wants it any more."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.active:
+                return
+            job.sessions.discard(session_id)
+            if not job.sessions:
+                job.cancel_requested = True
+                self._inflight.pop(job.key, None)
+                if job.status == QUEUED:
+                    self._finish(job, CANCELLED)
+
+    def summary(self):
+        """Counts of jobs per status plus the pool size."""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, CANCELLED, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts["max_jobs"] = self.max_jobs
+        return counts
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_requested = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(cancel_futures=True)
+
+    def _process_pool(self):
+        """The process pool every parallel job simulates on, started on first use."""
+        with self._lock:
+            if self._processes is None:
+                import multiprocessing as mp
+                from concurrent.futures import ProcessPoolExecutor
+
+                # spawn (not fork): the Streamlit server is multi-threaded
+                self._processes = ProcessPoolExecutor(max_workers=self.max_jobs, mp_context=mp.get_context("spawn"))
+            return self._processes
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started = time.time()
+        kwargs = dict(job.kwargs)
+        engine = kwargs.pop("engine")
+        if kwargs["workers"] > 1 and engine != "exact":
+            kwargs["pool"] = self._process_pool()
+
+        def _progress(done, total, max_hw):
+            job.runs_done, job.max_half_width = done, max_hw
+            if job.cancel_requested:
+                raise JobCancelled()
+
+        def _partial(done, probs, half_width):
+            job.partial = (list(job.teams_dict), probs, half_width)
+
+        try:
+            # pool threads never ran a session's script: record the phases for the session that asked
+            with metrics.recording(job.metrics):
+                result = odds_matrix(job.teams_dict, engine, progress=_progress, partial=_partial,
+                                     cache=self.cache, **kwargs)
+        except JobCancelled:
+            status, result, error = CANCELLED, None, None
+        except Exception as exc:  # surfaced to every session polling the job
+            status, result, error = FAILED, None, exc
+        else:
+            status, error = DONE, None
+        with self._lock:
+            job.result, job.error = result, error
+            self._finish(job, status)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished = time.time()
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+
+    def _expire(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values()
+                       if not j.active and now - j.finished > self.keep_finished]:
+            del self._jobs[job_id]
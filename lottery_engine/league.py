@@ -0,0 +1,53 @@
+# lottery_engine/league.py
+"""Applied team list of a league: names, tickets and seeds in arrays, plus the lottery format."""
+from collections.abc import Mapping
+
+import numpy as np
+
+from .formats import as_format
+
+
+class League(Mapping):
+    """
+    Read-only {team: tickets} mapping backed by a name tuple and a ticket array.
+
+    Engine functions take it wherever they take a teams_dict. It also
+    carries each team's seed (1 = most tickets, ties in listing order, as
+    everywhere in the engine) and the LotteryFormat the league was set up
+    with, so a session needs no separate seed or format entries.
+    """
+
+    __slots__ = ("teams", "tickets", "seeds", "format")
+
+    def __init__(self, teams_dict=None, fmt=None):
+        teams_dict = {} if teams_dict is None else teams_dict
+        self.teams = tuple(teams_dict)
+        self.tickets = np.fromiter(teams_dict.values(), dtype=np.int64, count=len(self.teams))
+        self.seeds = np.empty(len(self.teams), dtype=np.int64)
+        self.seeds[np.argsort(-self.tickets, kind="stable")] = np.arange(1, len(self.teams) + 1)
+        self.format = as_format(fmt)
+
+    def __getitem__(self, team):
+        try:
+            return int(self.tickets[self.teams.index(team)])
+        except ValueError:
+            raise KeyError(team) from None
+
+    def __iter__(self):
+        return iter(self.teams)
+
+    def __len__(self):
+        return len(self.teams)
+
+    def __repr__(self):
+        return f"League({dict(self)!r}, {self.format!r})"
+
+    @property
+    def total(self):
+        return int(self.tickets.sum())
+
+    def seed(self, team):
+        """Seed of a team (1 = most tickets), None if it is not in the league."""
+        if team not in self.teams:
+            return None
+        return int(self.seeds[self.teams.index(team)])
@@ -0,0 +1,128 @@
+# lottery_engine/live.py
+"""State of a running draft lottery ceremony."""
+import numpy as np
+
+from . import metrics
+from .formats import as_format
+
+
+class LiveLottery:
+    """
+    Pool state of a running ceremony.
+
+    Holds per-team remaining combination counts and an eliminated mask, so
+    removing a team, drawing the next combination and the current chances
+    all cost O(teams) rather than a pass over the pool.
+
+    With a lottery format (fmt) protected teams never enter the pool and
+    advance() hands out the picks that are not drawn (protected, forced by
+    the maximum drop, or past the lottery picks) by seed.
+
+    Awarded picks live in two preallocated arrays (combination rank and
+    team id per pick, rank -1 for picks given by seed); `drawn` lists them
+    as (rank, team id) pairs.
+    """
+
+    __slots__ = ("teams", "tickets", "assignment", "remaining", "eliminated", "picked_ranks", "picked_teams",
+                 "picks", "format", "seeds", "plan", "total_remaining")
+
+    def __init__(self, assignment, teams_dict, fmt=None):
+        self.teams = tuple(teams_dict)
+        self.tickets = np.fromiter(teams_dict.values(), dtype=np.int64, count=len(self.teams))
+        self.assignment = assignment
+        self.remaining = self.tickets.copy()
+        self.eliminated = np.zeros(len(self.teams), dtype=bool)  # picked, or out of the draw
+        self.picked_ranks = np.full(len(self.teams), -1, dtype=np.int64)
+        self.picked_teams = np.full(len(self.teams), -1, dtype=np.int64)
+        self.picks = 0  # picks awarded so far
+        self.format = as_format(fmt)
+        self.seeds = np.argsort(-self.tickets, kind="stable")  # team id per seed index
+        self.plan = None if self.format.is_full_draw(len(self.teams)) else self.format.plan(len(self.teams))
+        if self.plan is not None:
+            out = self.seeds[self.plan.protected]
+            self.eliminated[out] = True
+            self.remaining[out] = 0
+        self.total_remaining = int(self.remaining.sum())
+
+    @metrics.timed("lookup")
+    def team_id(self, rank):
+        """Owner of a combination rank (-1 if unassigned), whether or not it is still in the pool."""
+        return self.assignment[rank]
+
+    def is_live(self, team_id):
+        return team_id >= 0 and not self.eliminated[team_id]
+
+    @metrics.timed("removal")
+    def award(self, rank, team_id):
+        """Record a drawn combination and remove all of the team's combinations. Returns the pick number."""
+        self.picked_ranks[self.picks] = rank
+        self.picked_teams[self.picks] = team_id
+        self.picks += 1
+        self.eliminated[team_id] = True
+        self.total_remaining -= int(self.remaining[team_id])
+        self.remaining[team_id] = 0
+        return self.picks
+
+    @property
+    def drawn(self):
+        """(rank, team id) per awarded pick, in pick order; rank -1 for picks given by seed."""
+        return list(zip(self.picked_ranks[:self.picks].tolist(), self.picked_teams[:self.picks].tolist()))
+
+    def _next_by_seed(self):
+        """Team id the next pick goes to without a draw, or None when it is drawn."""
+        pick = self.picks
+        if self.plan is None or pick >= len(self.teams):
+            return None
+        if self.plan.protected[pick]:
+            return int(self.seeds[pick])
+        waiting = ~self.eliminated[self.seeds[self.plan.free]][None, :]
+        k = int(np.searchsorted(self.plan.slots, pick))
+        if k >= self.plan.lottery or self.plan.must_serve(waiting, k)[0]:
+            return int(self.seeds[self.plan.free[np.argmax(waiting[0])]])
+        return None
+
+    def advance(self):
+        """Award every upcoming pick that goes by seed; returns their (pick, team id) in order."""
+        given = []
+        while (team_id := self._next_by_seed()) is not None:
+            given.append((self.award(-1, team_id), team_id))
+        return given
+
+    @property
+    def finished(self):
+        """True once every team has its pick."""
+        return self.picks == len(self.teams)
+
+    @metrics.timed("draw")
+    def sample(self, rng):
+        """Draw a (rank, team id) uniformly from the remaining assigned combinations."""
+        if self.total_remaining == 0:
+            raise ValueError("No combinations left!")
+        hit = rng.integers(self.total_remaining)
+        team_id = int(np.searchsorted(np.cumsum(self.remaining), hit, side="right"))
+        return self.assignment.rank(team_id, rng.integers(self.tickets[team_id])), team_id
+
+    def chances(self):
+        """Current chance (%) of each team to win the next pick."""
+        if self.total_remaining == 0:
+            return np.zeros(len(self.teams))
+        return np.round(self.remaining / self.total_remaining * 100, 4)
+
+    def status_frame(self):
+        """Team / Remaining combos / Current chance (%) table, best chance first."""
+        import pandas as pd
+
+        df = pd.DataFrame({"Team": self.teams, "Remaining combos": self.remaining,
+                           "Current chance (%)": self.chances()})
+        return df.sort_values("Current chance (%)", ascending=False)
+
+    def drawn_frame(self):
+        """Drawn combinations table for display and CSV export ("by seed" for picks that were not drawn)."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            [{"Combination": self.assignment.label(rank) if rank >= 0 else "by seed", "Team": self.teams[t],
+              "Original_Tickets": int(self.tickets[t]), "Pick": pick}
+             for pick, (rank, t) in enumerate(self.drawn, start=1)],
+            columns=["Combination", "Team", "Original_Tickets", "Pick"],
+        )
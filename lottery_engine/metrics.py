@@ -0,0 +1,259 @@
+# lottery_engine/metrics.py
+"""
+Low-overhead counters and timing histograms for the hot paths.
+
+Instrumentation is off unless FANTASY_LOTTERY_METRICS=1 (or enable() is
+called): then timer() hands back one shared no-op context and count() /
+timed functions return after a single flag check. When on, every record
+goes to the process registry (PROCESS) and to the registry of the
+current session, if the caller set one with recording(). Histograms use
+fixed log-spaced buckets, so recording is O(log buckets) with no
+allocation and the Prometheus text export is exact.
+
+Work done in spawned worker processes is not seen here; the parent
+records the simulation rounds that wait for them.
+"""
+import bisect
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+# Upper bounds (seconds) of the timing buckets; the last bucket is +Inf.
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = os.environ.get("FANTASY_LOTTERY_METRICS", "").lower() in ("1", "true", "yes", "on")
+_session = ContextVar("lottery_metrics_session", default=None)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (capped at the largest observation)."""
+        if not self.count:
+            return float("nan")
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (math.inf,), self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Named counters and timing histograms; safe to share across threads."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = _Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def summary(self):
+        """One row per timing: name, count, total/mean/p50/p95/max in ms, sorted by total time."""
+        with self._lock:
+            rows = [{"name": name, "count": h.count, "total_ms": h.total * 1000,
+                     "mean_ms": h.total / h.count * 1000 if h.count else float("nan"),
+                     "p50_ms": h.quantile(0.5) * 1000, "p95_ms": h.quantile(0.95) * 1000, "max_ms": h.max * 1000}
+                    for name, h in self.histograms.items()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "counters": dict(self.counters),
+                "timings": {name: {"count": h.count, "sum_seconds": h.total, "max_seconds": h.max,
+                                   "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.buckets))}
+                            for name, h in self.histograms.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix="fantasy_lottery", labels=None):
+        """Prometheus text exposition: <name>_total counters and <name>_seconds histograms."""
+        extra = "".join(f',{k}="{v}"' for k, v in (labels or {}).items())
+        plain = "{" + extra[1:] + "}" if extra else ""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{prefix}_{_metric_name(name)}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric}{plain} {value}"]
+            for name, h in sorted(self.histograms.items()):
+                metric = f"{prefix}_{_metric_name(name)}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, n in zip([repr(b) for b in BUCKETS] + ["+Inf"], h.buckets):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{le="{bound}"{extra}}} {cumulative}')
+                lines += [f"{metric}_sum{plain} {h.total!r}", f"{metric}_count{plain} {h.count}"]
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+PROCESS = Metrics()
+
+
+@contextlib.contextmanager
+def recording(registry):
+    """Also record into `registry` (a session's Metrics) inside this block, on this thread or task."""
+    token = _session.set(registry)
+    try:
+        yield registry
+    finally:
+        _session.reset(token)
+
+
+def bind(registry):
+    """
+    Record into `registry` for the rest of the current thread or task, like recording() without the block.
+
+    Meant for a whole Streamlit script run: a session's runs happen on a
+    script thread of its own, so the binding never reaches another session.
+    """
+    _session.set(registry)
+
+
+def current():
+    """The registry this thread or task records into (besides PROCESS), or None."""
+    return _session.get()
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    PROCESS.count(name, n)
+    session = _session.get()
+    if session is not None:
+        session.count(name, n)
+
+
+def observe(name, seconds):
+    if not _enabled:
+        return
+    PROCESS.observe(name, seconds)
+    session = _session.get()
+    if session is not None:
+        session.observe(name, seconds)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL = contextlib.nullcontext()
+
+
+def timer(name):
+    """Context manager timing its block into histogram `name` (a shared no-op when disabled)."""
+    return _Timer(name) if _enabled else _NULL
+
+
+def timed(name):
+    """Decorator form of timer()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Timer(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def serve(port, registry=PROCESS, host="0.0.0.0"):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; returns the server.
+
+    For scraping a running app: the Streamlit server has no route of its own for this.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, kind = registry.to_json().encode("utf-8"), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, kind = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # keep scrapes out of the app log
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), _Handler)
+    threading.Thread(target=server.serve_forever, name="lottery-metrics", daemon=True).start()
+    return server
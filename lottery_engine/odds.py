@@ -0,0 +1,586 @@
+# lottery_engine/odds.py
+"""NumPy odds engine for the fantasy draft lottery (Monte-Carlo and exact)."""
+import math
+import os
+
+import numpy as np
+
+from . import metrics
+from .cache import OddsCache
+from .formats import (
+    as_format, format_exact_probs_batch, format_pick_sums, format_state_count, reduced_prefix, reduced_weights,
+)
+from .rng import chunk_rng, make_rng, new_seed
+
+# Runs per independently seeded chunk. Chunks (not workers) own the RNG
+# streams, so a seed gives the same counts for any number of workers.
+RUN_CHUNK = 100000
+
+
+def _ticket_vector(teams_dict):
+    """Encode teams as integer ids 0..T-1 and return (team names, ticket array)."""
+    teams = list(teams_dict.keys())
+    weights = np.asarray([teams_dict[t] for t in teams], dtype=np.float64)
+    return teams, weights
+
+
+def _simulate_pick_counts(weights, n_simulations, rng, batch_size=50000):
+    """
+    Count how often each team lands each pick over n_simulations lotteries.
+
+    Drawing a combo uniformly from the remaining pool and then removing all
+    combos of that team is weighted sampling without replacement by ticket
+    count. Sorting independent Exp(1) / tickets keys reproduces exactly that
+    draw order, so a whole batch of lotteries is one argsort.
+    Returns a (teams x picks) int64 matrix.
+    """
+    n_teams = len(weights)
+    counts = np.zeros(n_teams * n_teams, dtype=np.int64)
+    pick_offsets = np.arange(n_teams, dtype=np.int64)
+    done = 0
+    with np.errstate(divide="ignore"):
+        while done < n_simulations:
+            size = min(batch_size, n_simulations - done)
+            with metrics.timer("simulate.draw"):
+                keys = rng.standard_exponential((size, n_teams)) / weights
+                order = np.argsort(keys, axis=1)  # order[s, p] = team id at pick p+1
+            with metrics.timer("simulate.aggregate"):
+                counts += np.bincount((order * n_teams + pick_offsets).ravel(), minlength=n_teams * n_teams)
+            done += size
+    return counts.reshape(n_teams, n_teams)
+
+
+def _rb_pick_sums(weights, n_simulations, rng, batch_cells=1_000_000):
+    """
+    Rao-Blackwellized pick odds: (sum, sum of squares) over n_simulations runs, each (teams x picks).
+
+    Only the draw order is sampled (same exponential race as
+    _simulate_pick_counts). Instead of a 0/1 hit for the team drawn at pick
+    k, every run scores each team still in the pool with its exact
+    conditional chance there, tickets / tickets left before pick k. The mean
+    is unbiased for the same odds with far less variance (pick 1 is exact).
+    """
+    n_teams = len(weights)
+    sums = np.zeros((n_teams, n_teams))
+    squares = np.zeros((n_teams, n_teams))
+    picks = np.arange(n_teams)
+    batch = max(1, batch_cells // (n_teams * n_teams))
+    done = 0
+    with np.errstate(divide="ignore"):
+        while done < n_simulations:
+            size = min(batch, n_simulations - done)
+            with metrics.timer("simulate.draw"):
+                order = np.argsort(rng.standard_exponential((size, n_teams)) / weights, axis=1)
+            with metrics.timer("simulate.aggregate"):
+                drawn = weights[order]
+                left = weights.sum() - (np.cumsum(drawn, axis=1) - drawn)  # tickets left before each pick
+                inv_left = np.divide(1.0, left, out=np.zeros_like(left), where=left > 0)
+                position = np.empty_like(order)
+                np.put_along_axis(position, order, picks[None, :], axis=1)
+                # x[s, team, k] = 1 / left[s, k] while the team is still in the pool at pick k
+                x = np.where(position[:, :, None] >= picks[None, None, :], inv_left[:, None, :], 0.0)
+                sums += x.sum(axis=0)
+                squares += np.einsum("stk,stk->tk", x, x)
+            done += size
+    return sums * weights[:, None], squares * (weights ** 2)[:, None]
+
+
+def _odds_table(teams, probs, half_width=None):
+    """
+    Turn a (teams x picks) probability matrix into the percents dict and 'Pick N' DataFrame.
+
+    With half_width (same shape, probability units) a 'Pick N ±' column with
+    the confidence-interval half-width follows each 'Pick N' column.
+    """
+    import pandas as pd
+
+    pct = np.round(probs * 100, 4)
+    max_picks = probs.shape[1]
+    percents = {
+        team: {pick: float(pct[i, pick - 1]) for pick in range(1, max_picks + 1)}
+        for i, team in enumerate(teams)
+    }
+    df = pd.DataFrame(pct, index=list(teams), columns=[f"Pick {c}" for c in range(1, max_picks + 1)])
+    if half_width is not None:
+        for c in range(max_picks, 0, -1):
+            df.insert(c, f"Pick {c} ±", np.round(half_width[:, c - 1] * 100, 4))
+    return percents, df
+
+
+class OddsTable:
+    """
+    Pick odds kept as arrays: teams, (teams x picks) probabilities, optional CI half-widths and the engine.
+
+    The compact form a session keeps between reruns; percent() answers the
+    lookups the ceremony needs and the 'Pick N' DataFrame / CSV of
+    _odds_table are only built when shown or downloaded.
+    """
+
+    __slots__ = ("teams", "probs", "half_width", "engine")
+
+    def __init__(self, teams, probs, half_width=None, engine=None):
+        self.teams = tuple(teams)
+        self.probs = np.asarray(probs, dtype=np.float64)
+        self.half_width = None if half_width is None else np.asarray(half_width, dtype=np.float64)
+        self.engine = engine
+
+    @property
+    def picks(self):
+        return self.probs.shape[1]
+
+    def percent(self, team, pick):
+        """Chance (%) of a team to land a 1-based pick, rounded like the table; None if not computed."""
+        if team not in self.teams or not 1 <= pick <= self.picks:
+            return None
+        return float(np.round(self.probs[self.teams.index(team), pick - 1] * 100, 4))
+
+    def frame(self):
+        return _odds_table(self.teams, self.probs, self.half_width)[1]
+
+    def csv(self):
+        return self.frame().to_csv().encode("utf-8")
+
+
+def wilson_half_width(counts, n, z=1.96):
+    """Half-width of the Wilson score interval for counts/n (stays > 0 for zero counts)."""
+    p = counts / n
+    return z / (1 + z * z / n) * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+
+
+def rb_half_width(sums, squares, n, z=1.96):
+    """Normal-approximation CI half-width of a mean from its running sum and sum of squares."""
+    mean = sums / n
+    variance = np.maximum(squares / n - mean * mean, 0) * n / max(n - 1, 1)
+    return z * np.sqrt(variance / n)
+
+
+def _simulate_chunk(weights, n_simulations, seed, index, estimator="counts", plan=None):
+    """
+    Worker entry point: counts (or RB sums, squares) for chunk `index` of the stream of `seed`.
+
+    With a FormatPlan the weights must be in seed order and only the
+    lottery picks are sampled (formats.format_pick_sums).
+    """
+    rng = chunk_rng(seed, index)
+    if plan is not None:
+        sums, squares = format_pick_sums(reduced_weights(weights, plan), plan, n_simulations, rng,
+                                         rao_blackwell=estimator == "rao_blackwell")
+        sums = plan.expand(sums, fill=n_simulations)
+        if estimator == "rao_blackwell":
+            return sums, plan.expand(squares, fill=n_simulations)
+        return np.rint(sums).astype(np.int64)
+    if estimator == "rao_blackwell":
+        return _rb_pick_sums(weights, n_simulations, rng)
+    return _simulate_pick_counts(weights, n_simulations, rng)
+
+
+def default_workers():
+    """Number of worker processes used when the caller asks for 'all cores'."""
+    return os.cpu_count() or 1
+
+
+def simulate_progressive(weights, max_simulations, precision=None, seed=None, workers=1,
+                         chunk_size=RUN_CHUNK, picks=None, z=1.96, estimator="counts", plan=None, pool=None):
+    """
+    Run the simulation in rounds and yield (runs_done, counts, half_width) after each.
+
+    estimator "counts" tallies the team drawn at each pick (Wilson interval);
+    "rao_blackwell" sums every team's conditional chance per pick, so
+    `counts` are then expected hits (floats) and half_width is the normal
+    interval of the per-run mean (see _rb_pick_sums). plan (a FormatPlan,
+    weights in seed order) runs a lottery format instead of the full draw.
+
+    Chunk i always uses chunk_rng(seed, i), so a seed gives the same counts
+    for any number of workers (seed None draws a fresh one). With precision (probability units, e.g.
+    0.0005 for ±0.05 pct points) the generator stops as soon as every
+    team/pick cell in the first `picks` picks is within it.
+
+    pool is a process pool owned by the caller (e.g. JobScheduler's, shared
+    by all jobs): rounds of `workers` chunks run on it and it is left open.
+    Without one, workers > 1 starts a pool for this call only.
+    """
+    n_teams = len(weights)
+    picks = n_teams if picks is None else min(int(picks), n_teams)
+    seed = new_seed() if seed is None else seed
+    workers = max(1, int(workers))
+    rao_blackwell = estimator == "rao_blackwell"
+    counts = np.zeros((n_teams, n_teams), dtype=np.float64 if rao_blackwell else np.int64)
+    squares = np.zeros((n_teams, n_teams))
+    done = chunks = 0
+    own_pool = None
+    try:
+        if workers > 1 and pool is None:
+            import multiprocessing as mp
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn (not fork): the Streamlit server is multi-threaded
+            pool = own_pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+        while done < max_simulations:
+            sizes = []
+            left = max_simulations - done
+            while left > 0 and len(sizes) < workers:
+                sizes.append(min(chunk_size, left))
+                left -= sizes[-1]
+            indices = range(chunks, chunks + len(sizes))
+            chunks += len(sizes)
+            with metrics.timer("simulate.round"):
+                if workers == 1 or pool is None:
+                    parts = [_simulate_chunk(weights, n, seed, i, estimator, plan) for n, i in zip(sizes, indices)]
+                else:
+                    parts = list(pool.map(_simulate_chunk, [weights] * len(sizes), sizes, [seed] * len(sizes),
+                                          indices, [estimator] * len(sizes), [plan] * len(sizes)))
+            metrics.count("simulate.runs", sum(sizes))
+            # Fold chunks in order and stop at the first one that meets the
+            # target, so the stopping point does not depend on the round size.
+            converged = False
+            for n, part in zip(sizes, parts):
+                done += n
+                if rao_blackwell:
+                    counts = counts + part[0]
+                    squares = squares + part[1]
+                    half_width = rb_half_width(counts, squares, done, z)
+                else:
+                    counts = counts + part
+                    half_width = wilson_half_width(counts, done, z)
+                if precision is not None and half_width[:, :picks].max() <= precision:
+                    converged = True
+                    break
+            yield done, counts, half_width
+            if converged:
+                break
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown(cancel_futures=True)
+
+
+def simulate_counts(weights, n_simulations, seed=None, workers=1):
+    """(teams x picks) counts for n_simulations runs (all rounds of simulate_progressive)."""
+    counts = None
+    for _, counts, _ in simulate_progressive(weights, n_simulations, seed=seed, workers=workers):
+        pass
+    return counts
+
+
+def _simulate_probs(weights, n_simulations, seed=None, picks=None, workers=1, precision=None, progress=None,
+                    partial=None, estimator="counts", plan=None, pool=None):
+    """
+    (probs, half_width, runs_done) for the first `picks` picks; see simulate_lotteries.
+
+    partial(runs_done, probs, half_width) receives the running estimate after every round.
+    """
+    picks = len(weights) if picks is None else min(int(picks), len(weights))
+    target = None if precision is None else precision / 100
+    done, counts, half_width = 0, None, None
+    for done, counts, half_width in simulate_progressive(weights, n_simulations, precision=target, seed=seed,
+                                                         workers=workers, picks=picks, estimator=estimator,
+                                                         plan=plan, pool=pool):
+        if progress is not None:
+            progress(done, n_simulations, float(half_width[:, :picks].max() * 100))
+        if partial is not None:
+            partial(done, counts[:, :picks] / done, half_width[:, :picks])
+    return counts[:, :picks] / done, half_width[:, :picks], done
+
+
+def simulate_lotteries(teams_dict, n_simulations=10000, seed=None, picks=None, workers=1,
+                       precision=None, progress=None, estimator="counts", fmt=None):
+    """
+    Monte Carlo simulation to estimate draft odds for each pick (vectorized, optionally multi-core).
+
+    The DataFrame carries a 'Pick N ±' 95% CI half-width column after every
+    pick. precision (in percentage points) stops early once all cells are
+    that tight; progress(runs_done, n_simulations, max_half_width_pct) is
+    called after every round. estimator="rao_blackwell" scores conditional
+    chances instead of hits: same table, much narrower intervals per run.
+    fmt (a LotteryFormat) runs that format; seeds follow tickets, ties by
+    listing order.
+    """
+    teams, weights = _ticket_vector(teams_dict)
+    order, inverse = _seed_order(weights)
+    plan = _format_plan(fmt, len(teams))
+    probs, half_width, _ = _simulate_probs(weights[order], n_simulations, seed=seed, picks=picks, workers=workers,
+                                           precision=precision, progress=progress, estimator=estimator, plan=plan)
+    return _odds_table(teams, probs[inverse], half_width[inverse])
+
+
+def _seed_order(weights):
+    """(order, inverse): seed order (most tickets first, stable) and its inverse permutation."""
+    order = np.argsort(-weights, kind="stable")
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return order, inverse
+
+
+def _format_plan(fmt, n_teams):
+    """FormatPlan of a format, or None for the full draw (the engines' unconstrained fast paths)."""
+    fmt = as_format(fmt)
+    return None if fmt.is_full_draw(n_teams) else fmt.plan(n_teams)
+
+
+# Largest number of "already drawn" team sets the exact engine will enumerate.
+EXACT_MAX_STATES = 1_100_000
+
+
+def _exact_state_count(n_teams, picks):
+    """Number of drawn-team sets the exact recursion visits for the first `picks` picks."""
+    return sum(math.comb(n_teams, k) for k in range(min(picks, n_teams)))
+
+
+def _exact_pick_probs_batch(weights, picks):
+    """
+    Exact (candidates x teams x picks) probabilities for a (candidates x teams) weight matrix.
+
+    Only the *set* of teams already drawn matters for the next pick, so the
+    recursion is memoized on a bitmask of drawn teams and evaluated layer by
+    layer (all sets of size k, then k+1, ...), merging equal sets as it goes.
+    The sets are the same for every candidate, so candidates ride along as
+    rows of the per-set probability mass.
+    """
+    n_candidates, n_teams = weights.shape
+    total = weights.sum(axis=1)
+    probs = np.zeros((n_candidates, n_teams, picks))
+    masks = np.zeros(1, dtype=np.int64)
+    mass = np.ones((n_candidates, 1))
+    removed = np.zeros((n_candidates, 1))
+    for k in range(picks):
+        next_masks, next_mass, next_removed = [], [], []
+        share = mass / (total[:, None] - removed)  # P(set) / tickets left, per candidate
+        for j in range(n_teams):
+            bit = np.int64(1) << j
+            open_ = np.flatnonzero((masks & bit) == 0)
+            if not len(open_):
+                continue
+            p = share[:, open_] * weights[:, j, None]
+            probs[:, j, k] = p.sum(axis=1)
+            if k + 1 < picks:
+                next_masks.append(masks[open_] | bit)
+                next_mass.append(p)
+                next_removed.append(removed[:, open_] + weights[:, j, None])
+        if k + 1 < picks:
+            masks, first, inverse = np.unique(np.concatenate(next_masks), return_index=True, return_inverse=True)
+            flat_mass = np.concatenate(next_mass, axis=1)
+            mass = np.stack([np.bincount(inverse, weights=row, minlength=len(masks)) for row in flat_mass])
+            removed = np.concatenate(next_removed, axis=1)[:, first]
+    return probs
+
+
+def _exact_pick_probs(weights, picks):
+    """Exact (teams x picks) probability matrix for weighted draws without replacement."""
+    return _exact_pick_probs_batch(np.asarray(weights, dtype=np.float64)[None, :], picks)[0]
+
+
+def exact_odds(teams_dict, picks=None):
+    """Exact per-pick odds; same return shape as simulate_lotteries."""
+    teams, weights = _ticket_vector(teams_dict)
+    picks = len(teams) if picks is None else min(int(picks), len(teams))
+    return _odds_table(teams, _exact_pick_probs(weights, picks))
+
+
+def _format_exact_probs(weights, plan, picks):
+    """Exact (teams x picks) odds of a format for seed-ordered weights."""
+    reduced = format_exact_probs_batch(reduced_weights(weights, plan)[None, :], plan)[0]
+    return plan.expand(reduced)[:, :picks]
+
+
+def choose_odds_engine(n_teams, picks, fmt=None):
+    """Return 'exact' when the exact recursion is cheap enough, else 'monte_carlo'."""
+    plan = _format_plan(fmt, n_teams)
+    states = _exact_state_count(n_teams, picks) if plan is None else format_state_count(plan)
+    if states <= EXACT_MAX_STATES:
+        return "exact"
+    return "monte_carlo"
+
+
+def odds_matrix(teams_dict, engine, picks=None, n_simulations=10000, seed=None, precision=None,
+                workers=1, progress=None, cache=None, partial=None, fmt=None, pool=None):
+    """
+    Raw odds from the given engine, served from cache when possible.
+
+    engine is 'exact', 'monte_carlo' (hit counting) or 'rao_blackwell'
+    (Monte-Carlo scoring conditional chances, see _rb_pick_sums).
+    Returns (teams, probs, half_width, info): probs/half_width are (teams x
+    picks) arrays in probability units (half_width is None for exact odds);
+    info has 'from_cache', 'runs' (Monte-Carlo runs actually done, None
+    for exact odds) and 'seed' (the seed the simulation ran with, drawn
+    fresh when seed is None; None for exact or cached odds).
+    partial(runs_done, probs, half_width) gets the running Monte-Carlo
+    estimate, in the caller's team order, after every round. fmt (a
+    LotteryFormat, None = full draw) sets the lottery rules; seeds follow
+    tickets, ties by listing order. pool: see simulate_progressive. Needs
+    NumPy only.
+    """
+    teams, weights = _ticket_vector(teams_dict)
+    picks = len(teams) if picks is None else min(int(picks), len(teams))
+    # rows are computed in seed (sorted-ticket) order; map them back to the caller's teams
+    order, inverse = _seed_order(weights)
+    sorted_weights = weights[order]
+    plan = _format_plan(fmt, len(teams))
+    key = None
+    entry = None
+    if cache is not None:
+        key = OddsCache.key(sorted_weights, picks, engine, n_simulations, seed, precision,
+                            fmt=None if plan is None else as_format(fmt).key())
+        entry = cache.get(key)
+    from_cache = entry is not None
+    metrics.count("odds.cache_hits" if from_cache else "odds.computed")
+    run_seed = None
+    if entry is None:
+        with metrics.timer(f"odds.{engine}"):
+            if engine == "exact":
+                probs = (_exact_pick_probs(sorted_weights, picks) if plan is None
+                         else _format_exact_probs(sorted_weights, plan, picks))
+                entry = (probs, None, 0)
+            else:
+                unsorted = None if partial is None else (lambda done, p, hw: partial(done, p[inverse], hw[inverse]))
+                run_seed = new_seed() if seed is None else seed
+                entry = _simulate_probs(sorted_weights, n_simulations, seed=run_seed, picks=picks, workers=workers,
+                                        precision=precision, progress=progress, partial=unsorted,
+                                        estimator="rao_blackwell" if engine == "rao_blackwell" else "counts", plan=plan,
+                                        pool=pool)
+        if cache is not None:
+            cache.put(key, *entry)
+    probs, half_width, done = entry
+    half_width = None if half_width is None else half_width[inverse]
+    return teams, probs[inverse], half_width, {"from_cache": from_cache, "seed": run_seed,
+                                               "runs": None if engine == "exact" else done}
+
+
+def compute_odds(teams_dict, engine, picks=None, n_simulations=10000, seed=None, precision=None,
+                 workers=1, progress=None, cache=None, fmt=None):
+    """odds_matrix as (percents, df, info), the same table shape as simulate_lotteries."""
+    teams, probs, half_width, info = odds_matrix(teams_dict, engine, picks=picks, n_simulations=n_simulations,
+                                                 seed=seed, precision=precision, workers=workers,
+                                                 progress=progress, cache=cache, fmt=fmt)
+    percents, df = _odds_table(teams, probs, half_width)
+    return percents, df, info
+
+
+# Budget for one sweep_odds Monte-Carlo batch: candidates x runs x teams keys.
+SWEEP_BATCH_CELLS = 4_000_000
+
+
+def sweep_odds(ticket_matrix, picks=None, engine="auto", n_simulations=20000, seed=None):
+    """
+    Pick odds for many candidate ticket vectors in one batched pass.
+
+    ticket_matrix is (candidates x teams); the result is a (candidates x
+    teams x picks) probability tensor. The exact engine runs the layered
+    recursion once for all candidates. The Monte-Carlo engine uses common
+    random numbers: every candidate is scored on the same Exp(1) draws, so
+    differences between candidates are not drowned in simulation noise and
+    a seed gives a smooth, repeatable surface for solvers to search.
+    """
+    weights = np.atleast_2d(np.asarray(ticket_matrix, dtype=np.float64))
+    n_candidates, n_teams = weights.shape
+    picks = n_teams if picks is None else min(int(picks), n_teams)
+    if engine == "auto":
+        engine = choose_odds_engine(n_teams, picks)
+    if engine == "exact":
+        return _exact_pick_probs_batch(weights, picks)
+    rng = make_rng(seed)
+    counts = np.zeros(n_candidates * n_teams * n_teams, dtype=np.int64)
+    # cell index = candidate * T*T + team * T + pick
+    offsets = (np.arange(n_candidates)[:, None, None] * n_teams * n_teams + np.arange(n_teams)[None, None, :])
+    batch = max(1, SWEEP_BATCH_CELLS // (n_candidates * n_teams))
+    done = 0
+    with np.errstate(divide="ignore"):
+        while done < n_simulations:
+            size = min(batch, n_simulations - done)
+            draws = rng.standard_exponential((size, n_teams))
+            order = np.argsort(draws[None, :, :] / weights[:, None, :], axis=2)
+            counts += np.bincount((order * n_teams + offsets).ravel(), minlength=counts.size)
+            done += size
+    return counts.reshape(n_candidates, n_teams, n_teams)[:, :, :picks] / n_simulations
+
+
+# Budget for odds recomputed live during the ceremony (kept well under 100 ms).
+LIVE_EXACT_MAX_STATES = 70000
+LIVE_RUNS = 30000
+
+
+def _format_conditional_odds(teams_dict, drawn, fmt, n_simulations, seed, cache):
+    """
+    (percents, df, info, engine) of the picks left under a format, given the teams placed so far (in pick order).
+
+    A format is not the same lottery on the sub-league (seeds, deadlines and
+    the lottery length stay those of the full league), so the format
+    engines resume from the placed teams as a slot-rank prefix instead.
+    """
+    teams, weights = _ticket_vector(teams_dict)
+    order, inverse = _seed_order(weights)
+    plan = as_format(fmt).plan(len(teams))
+    index = {t: i for i, t in enumerate(teams)}
+    prefix = reduced_prefix(plan, [inverse[index[t]] for t in drawn])
+    reduced = reduced_weights(weights[order], plan)
+    states = format_state_count(plan)
+    engine = "exact" if states <= LIVE_EXACT_MAX_STATES else "monte_carlo"
+    key = entry = None
+    if cache is not None:
+        key = OddsCache.key(weights[order], len(teams), engine, n_simulations, seed, None,
+                            fmt=as_format(fmt).key(), drawn=prefix)
+        entry = cache.get(key)
+    from_cache = entry is not None
+    if entry is None:
+        if engine == "exact":
+            entry = (plan.expand(format_exact_probs_batch(reduced[None, :], plan, prefix=prefix)[0]), None, 0)
+        else:
+            counts, _ = format_pick_sums(reduced, plan, n_simulations, make_rng(seed), prefix=prefix)
+            counts = plan.expand(counts, fill=n_simulations)
+            entry = (counts / n_simulations, wilson_half_width(counts, n_simulations), n_simulations)
+        if cache is not None:
+            cache.put(key, *entry)
+    probs, half_width, done = entry
+    placed = set(drawn)
+    rows = [inverse[i] for i, t in enumerate(teams) if t not in placed]
+    offset = len(drawn)  # columns come back as picks 1.. and are relabelled by the caller
+    percents, df = _odds_table([t for t in teams if t not in placed], probs[rows, offset:],
+                               None if half_width is None else half_width[rows, offset:])
+    info = {"from_cache": from_cache, "seed": None, "runs": None if engine == "exact" else done}
+    return percents, df, info, engine
+
+
+def conditional_odds(teams_dict, drawn, n_simulations=LIVE_RUNS, seed=None, cache=None, fmt=None):
+    """
+    Odds for the remaining picks given the teams already drawn (in draft order).
+
+    The remaining draw is the same lottery over the undrawn teams, so this is
+    compute_odds on that sub-league with picks relabelled after len(drawn).
+    Exact when the sub-league is small enough, a LIVE_RUNS Monte-Carlo
+    otherwise; with a cache every ticket configuration reached in any
+    ceremony is only computed once.
+
+    Each pick cuts the recursion down to the undrawn teams; nothing else of
+    the previous state is reused, on purpose. The exact layers of a state
+    hold the chances of *reaching* each drawn set, not the odds from a set
+    onward, so a child state cannot be read off them: that would need a
+    backward table of states x teams x picks (~130 MB at 16 teams). Runs
+    of the previous state that drew the awarded team are valid samples of
+    the new one, but only that team's share of them (often 5-15%) is kept,
+    and keeping the runs means storing them per session. A fresh
+    computation stays within the live budget (LIVE_EXACT_MAX_STATES,
+    LIVE_RUNS): a few ms exact, about 35 ms Monte-Carlo at 30 teams. With a lottery format (fmt) `drawn` lists
+    every team placed so far, forced and protected picks included. Returns
+    (percents, df, info) like compute_odds, with info['engine'] added.
+    """
+    drawn = list(drawn)
+    remaining = {t: k for t, k in teams_dict.items() if t not in set(drawn)}
+    offset = len(teams_dict) - len(remaining)
+    if not remaining:
+        import pandas as pd
+
+        return {}, pd.DataFrame(), {"from_cache": False, "runs": None, "engine": None}
+    if _format_plan(fmt, len(teams_dict)) is not None:
+        percents, df, info, engine = _format_conditional_odds(teams_dict, drawn, fmt, n_simulations, seed, cache)
+    else:
+        picks = len(remaining)
+        engine = "exact" if _exact_state_count(picks, picks) <= LIVE_EXACT_MAX_STATES else "monte_carlo"
+        percents, df, info = compute_odds(remaining, engine, picks=picks, n_simulations=n_simulations,
+                                          seed=seed, cache=cache)
+    percents = {t: {p + offset: v for p, v in row.items()} for t, row in percents.items()}
+
+    def _relabel(column):  # "Pick N" / "Pick N ±"
+        parts = column.split(" ")
+        parts[1] = str(int(parts[1]) + offset)
+        return " ".join(parts)
+
+    df = df.rename(columns=_relabel)
+    return percents, df, dict(info, engine=engine)
@@ -0,0 +1,277 @@
+# lottery_engine/orders.py
+"""
+Raw simulated draft orders on disk, and joint-outcome queries over them.
+
+simulate_lotteries keeps per-team/per-pick counters only; an OrderStore
+keeps every run's draft order as one uint8 row (team index per pick) in a
+memory-mapped .npy file, so questions about several teams at once ("A and
+B both top 3", "expected pick of a top-4 protected pick") can be asked
+after the fact. Queries stream the file in chunks, so tens of millions of
+runs never have to fit in RAM.
+
+Events (bool per run) and values (float per run) are small composable
+objects evaluated on a chunk of positions: positions[s, t] is the 1-based
+pick of team t in run s.
+"""
+import json
+import os
+
+import numpy as np
+
+from .formats import as_format, format_orders
+from .odds import RUN_CHUNK, _seed_order, _ticket_vector, rb_half_width, wilson_half_width
+from .rng import chunk_rng, new_seed
+
+ORDERS_FILE = "orders.npy"
+META_FILE = "meta.json"
+
+# Runs per query chunk: positions are expanded to intp while indexing, ~8 bytes per cell.
+QUERY_CHUNK = 250_000
+
+
+def _batches(n, size):
+    while n > 0:
+        yield min(size, n)
+        n -= size
+
+
+def _chunk_orders(sorted_weights, n_simulations, seed, index, plan):
+    """
+    (n_simulations x T) seed index per pick for chunk `index` of the stream of `seed`.
+
+    Batches match odds._simulate_pick_counts and formats.format_pick_sums,
+    so the stored orders are exactly the runs behind odds_matrix's counts
+    for the same seed and run count.
+    """
+    rng = chunk_rng(seed, index)
+    n_teams = len(sorted_weights)
+    parts = []
+    if plan is None:
+        with np.errstate(divide="ignore"):
+            for size in _batches(n_simulations, 50000):
+                parts.append(np.argsort(rng.standard_exponential((size, n_teams)) / sorted_weights, axis=1))
+    else:
+        for size in _batches(n_simulations, max(1, 1_000_000 // len(plan.free))):
+            parts.append(format_orders(sorted_weights, plan, size, rng))
+    return np.concatenate(parts)
+
+
+class OrderStore:
+    """
+    Read-only view of a directory written by OrderStore.simulate.
+
+    orders is the (runs x teams) uint8 memmap of team indices per pick (in
+    the order of `teams`); meta holds the tickets, seed and lottery format
+    the runs came from.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+        self.teams = list(self.meta["teams"])
+        self.orders = np.load(os.path.join(directory, ORDERS_FILE), mmap_mode="r")
+
+    @classmethod
+    def simulate(cls, directory, teams_dict, n_simulations, seed=None, fmt=None, progress=None):
+        """
+        Simulate n_simulations lotteries into `directory` and open the store.
+
+        Writes chunk by chunk (RUN_CHUNK runs at a time) straight into the
+        memmap. seed None draws a fresh one, recorded in meta['seed'].
+        progress(runs_done, n_simulations) is called after every chunk.
+        """
+        teams, weights = _ticket_vector(teams_dict)
+        if len(teams) > 255:
+            raise ValueError("An order store holds at most 255 teams.")
+        fmt = as_format(fmt)
+        order, _ = _seed_order(weights)
+        plan = None if fmt.is_full_draw(len(teams)) else fmt.plan(len(teams))
+        seed = new_seed() if seed is None else seed
+        os.makedirs(directory, exist_ok=True)
+        out = np.lib.format.open_memmap(os.path.join(directory, ORDERS_FILE), mode="w+", dtype=np.uint8,
+                                        shape=(int(n_simulations), len(teams)))
+        done = 0
+        for index, size in enumerate(_batches(int(n_simulations), RUN_CHUNK)):
+            out[done:done + size] = order[_chunk_orders(weights[order], size, seed, index, plan)]
+            done += size
+            if progress is not None:
+                progress(done, n_simulations)
+        out.flush()
+        del out
+        meta = {"teams": teams, "tickets": [int(t) for t in weights], "runs": int(n_simulations), "seed": seed,
+                "format": {"lottery_picks": fmt.lottery_picks, "max_drop": fmt.max_drop,
+                           "protected": list(fmt.protected)}}
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2)
+        return cls(directory)
+
+    @property
+    def runs(self):
+        return self.orders.shape[0]
+
+    def team_index(self, team):
+        try:
+            return self.teams.index(team)
+        except ValueError:
+            raise ValueError(f"Unknown team {team!r}.") from None
+
+    def positions(self, chunk_runs=QUERY_CHUNK):
+        """Yield (rows x teams) uint8 1-based picks of every team, chunk by chunk."""
+        picks = np.arange(1, len(self.teams) + 1, dtype=np.uint8)
+        for start in range(0, self.runs, chunk_runs):
+            orders = np.asarray(self.orders[start:start + chunk_runs])
+            pos = np.empty_like(orders)
+            pos[np.arange(len(orders))[:, None], orders] = picks
+            yield pos
+
+    def pick_odds(self, chunk_runs=QUERY_CHUNK):
+        """(teams x picks) probabilities, the same table simulate_lotteries estimates."""
+        n = len(self.teams)
+        counts = np.zeros(n * n, dtype=np.int64)
+        for pos in self.positions(chunk_runs):
+            counts += np.bincount((np.arange(n) * n + pos.astype(np.int64) - 1).ravel(), minlength=n * n)
+        return counts.reshape(n, n) / self.runs
+
+    def probability(self, event, given=None, chunk_runs=QUERY_CHUNK, z=1.96):
+        """
+        P(event | given) over the stored runs: (probability, Wilson half-width, runs where `given` holds).
+
+        The probability is nan when no run satisfies `given`.
+        """
+        hits = total = 0
+        for pos in self.positions(chunk_runs):
+            mask = _condition(self, given, pos)
+            hits += int(np.count_nonzero(event(self, pos) & mask))
+            total += int(np.count_nonzero(mask))
+        if not total:
+            return float("nan"), float("nan"), 0
+        return hits / total, float(wilson_half_width(hits, total, z)), total
+
+    def expected(self, value, given=None, chunk_runs=QUERY_CHUNK, z=1.96):
+        """E[value | given] over the stored runs: (mean, normal half-width, runs where `given` holds)."""
+        sums = squares = 0.0
+        total = 0
+        for pos in self.positions(chunk_runs):
+            mask = _condition(self, given, pos)
+            x = value(self, pos)[mask]
+            sums += float(x.sum())
+            squares += float((x * x).sum())
+            total += len(x)
+        if not total:
+            return float("nan"), float("nan"), 0
+        return sums / total, float(rb_half_width(sums, squares, total, z)), total
+
+
+def _condition(store, given, pos):
+    if given is None:
+        return np.ones(len(pos), dtype=bool)
+    return given(store, pos)
+
+
+class Event:
+    """A yes/no outcome per run; combine with &, | and ~."""
+
+    def __init__(self, fn, label="event"):
+        self.fn = fn  # fn(store, positions) -> bool per run
+        self.label = label
+
+    def __call__(self, store, pos):
+        return self.fn(store, pos)
+
+    def __and__(self, other):
+        return Event(lambda s, p: self(s, p) & other(s, p), f"({self.label} and {other.label})")
+
+    def __or__(self, other):
+        return Event(lambda s, p: self(s, p) | other(s, p), f"({self.label} or {other.label})")
+
+    def __invert__(self):
+        return Event(lambda s, p: ~self(s, p), f"not {self.label}")
+
+    def __repr__(self):
+        return f"Event({self.label})"
+
+
+class Value:
+    """A number per run (a pick, or its worth on a value curve); supports + and scaling."""
+
+    def __init__(self, fn, label="value"):
+        self.fn = fn  # fn(store, positions) -> float per run
+        self.label = label
+
+    def __call__(self, store, pos):
+        return self.fn(store, pos)
+
+    def __add__(self, other):
+        return Value(lambda s, p: self(s, p) + other(s, p), f"({self.label} + {other.label})")
+
+    def __mul__(self, factor):
+        return Value(lambda s, p: self(s, p) * factor, f"{factor} * {self.label}")
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return f"Value({self.label})"
+
+
+def _pick(store, pos, team):
+    return pos[:, store.team_index(team)]
+
+
+def lands(team, first, last=None):
+    """Team's pick is in first..last (1-based, inclusive; last None = just `first`)."""
+    last = first if last is None else last
+    return Event(lambda s, p: (_pick(s, p, team) >= first) & (_pick(s, p, team) <= last),
+                 f"{team} picks {first}-{last}")
+
+
+def top(team, k):
+    """Team lands one of the first k picks."""
+    return Event(lambda s, p: _pick(s, p, team) <= k, f"{team} top {k}")
+
+
+def before(a, b):
+    """Team a picks ahead of team b."""
+    return Event(lambda s, p: _pick(s, p, a) < _pick(s, p, b), f"{a} before {b}")
+
+
+def _worth(picks, curve):
+    """Pick numbers, or their value on a curve (curve[0] = worth of pick 1)."""
+    if curve is None:
+        return picks.astype(np.float64)
+    return np.asarray(curve, dtype=np.float64)[picks.astype(np.intp) - 1]
+
+
+def pick_of(team, curve=None):
+    """Team's pick number (or its worth on `curve`)."""
+    return Value(lambda s, p: _worth(_pick(s, p, team), curve), f"pick of {team}")
+
+
+def protected_pick(team, protect, curve=None):
+    """
+    Worth of a traded pick that conveys only outside the top `protect` (0 when it is kept).
+
+    Ask store.expected(protected_pick(...)) for the value including the
+    protection, or store.expected(pick_of(team), given=~top(team, protect))
+    for the expected pick when it conveys.
+    """
+    def _fn(s, p):
+        picks = _pick(s, p, team)
+        return np.where(picks > protect, _worth(picks, curve), 0.0)
+
+    return Value(_fn, f"{team} pick protected top {protect}")
+
+
+def swap_best(a, b, curve=None):
+    """Worth of the better of a's and b's picks (the holder of swap rights takes the earlier one)."""
+    return Value(lambda s, p: _worth(np.minimum(_pick(s, p, a), _pick(s, p, b)), curve), f"best of {a}, {b}")
+
+
+def swap_worst(a, b, curve=None):
+    """Worth of the worse of a's and b's picks (what the other side of a swap is left with)."""
+    return Value(lambda s, p: _worth(np.maximum(_pick(s, p, a), _pick(s, p, b)), curve), f"worst of {a}, {b}")
+
+
+def value_curve(n_picks, first=100.0, decay=0.85):
+    """Default pick-value curve: geometric decay from `first` for pick 1 (pass any sequence instead)."""
+    return first * decay ** np.arange(n_picks)
@@ -0,0 +1,29 @@
+# lottery_engine/pdf.py
+"""PDF export of a draft order (reportlab is imported on first use)."""
+from io import BytesIO
+
+from . import metrics
+
+
+@metrics.timed("pdf")
+def generate_draft_pdf(draft_order):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    p = canvas.Canvas(buf, pagesize=A4)
+    w, h = A4
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, h - 50, "Fantasy Draft Lottery - Draft Order")
+    p.setFont("Helvetica", 12)
+    y = h - 80
+    for i, team in enumerate(draft_order, start=1):
+        p.drawString(50, y, f"{i}. {team}")
+        y -= 18
+        if y < 50:
+            p.showPage()
+            p.setFont("Helvetica", 12)
+            y = h - 50
+    p.save()
+    buf.seek(0)
+    return buf
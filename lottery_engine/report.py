@@ -0,0 +1,462 @@
+# lottery_engine/report.py
+"""
+Ceremony reports: a multi-page PDF and a CSV bundle per league, built in batches.
+
+A CeremonyReport holds what one league's report shows: the draft order,
+the drawn combinations, each team's tickets and seed (so its movement vs
+seed) and the pre-draw pick odds. write_reports renders any number of
+them and streams the files into a directory or a zip archive; leagues
+are rendered in parallel worker processes when asked to. The app's
+download buttons use the same functions for a single league.
+
+Rendering caches what every report shares: fonts are registered once
+per process, table layouts are computed once per page size and column
+count, and the header/footer of a document is drawn once as a form and
+reused on every page. reportlab is imported on first use.
+"""
+import collections
+import csv
+import functools
+import io
+import os
+import re
+import zipfile
+
+import numpy as np
+
+from . import metrics
+from .audit import BY_SEED, _expand, export_teams
+from .formats import as_format
+from .odds import OddsTable, choose_odds_engine, default_workers, odds_matrix
+
+FONT_ENV = "FANTASY_LOTTERY_PDF_FONT"
+
+# Draft order table: (header, width in points, right-aligned).
+ORDER_COLUMNS = (("Pick", 34, True), ("Team", 150, False), ("Seed", 34, True), ("Move", 40, True),
+                 ("Tickets", 50, True), ("Share %", 48, True), ("Pre-draw %", 62, True), ("Combination", 97, False))
+
+
+class CeremonyReport:
+    """
+    One league's finished (or running) ceremony.
+
+    teams/tickets are in listing order and seeds follow tickets (ties in
+    listing order). listed=False says the listing order is unknown (teams
+    read from an export alone are in pick order): teams with equal tickets
+    then share the best seed of their group, so the draw cannot decide
+    their seeds. order holds the team id of every pick made so far and
+    combos the combination drawn for it ('by seed' for picks that were not
+    drawn). odds is an OddsTable of the pre-draw odds, or None to have
+    write_reports compute them.
+    """
+
+    __slots__ = ("league", "year", "teams", "tickets", "order", "combos", "format", "odds", "listed")
+
+    def __init__(self, teams_dict, order, combos, league="", year=None, fmt=None, odds=None, listed=True):
+        self.league = str(league)
+        self.year = year
+        self.teams = tuple(teams_dict)
+        self.tickets = np.fromiter(teams_dict.values(), dtype=np.int64, count=len(self.teams))
+        self.order = np.asarray(order, dtype=np.int64)
+        self.combos = tuple(combos)
+        self.format = as_format(fmt)
+        self.odds = odds
+        self.listed = bool(listed)
+
+    @classmethod
+    def from_live(cls, live, league="", year=None, odds=None):
+        """Report of a LiveLottery as it stands."""
+        drawn = live.drawn
+        return cls(dict(zip(live.teams, live.tickets.tolist())), [t for _, t in drawn],
+                   [live.assignment.label(rank) if rank >= 0 else BY_SEED for rank, _ in drawn],
+                   league=league, year=year, fmt=live.format, odds=odds)
+
+    @property
+    def title(self):
+        return " ".join(str(part) for part in (self.league or "Fantasy League", self.year) if part is not None)
+
+    def seeds(self):
+        """Seed (1 = most tickets) of every team; tied teams share a seed unless listed."""
+        by_seed = np.argsort(-self.tickets, kind="stable")
+        ranks = np.arange(1, len(self.teams) + 1)
+        if not self.listed:
+            ordered = self.tickets[by_seed]
+            starts = np.flatnonzero(np.diff(ordered, prepend=ordered[:1] + 1) != 0)
+            ranks = ranks[starts][np.searchsorted(starts, ranks - 1, side="right") - 1]
+        seeds = np.empty(len(self.teams), dtype=np.int64)
+        seeds[by_seed] = ranks
+        return seeds
+
+    @property
+    def shared_seeds(self):
+        """True when teams with equal tickets share a seed (listing order unknown)."""
+        return not self.listed and len(np.unique(self.tickets)) < len(self.tickets)
+
+    def rows(self):
+        """One dict per pick: Pick, Team, Seed, Move (+ = moved up), Tickets, Share %, Pre-draw %, Combination."""
+        seeds = self.seeds()
+        total = int(self.tickets.sum())
+        rows = []
+        for pick, (team_id, combo) in enumerate(zip(self.order.tolist(), self.combos), start=1):
+            team = self.teams[team_id]
+            pre = None if self.odds is None else self.odds.percent(team, pick)
+            rows.append({"Pick": pick, "Team": team, "Seed": int(seeds[team_id]),
+                         "Move": int(seeds[team_id]) - pick, "Tickets": int(self.tickets[team_id]),
+                         "Share %": round(float(self.tickets[team_id]) / total * 100, 2) if total else 0.0,
+                         "Pre-draw %": pre, "Combination": combo})
+        return rows
+
+    def key(self):
+        """Hashable summary of everything the report shows (for caching rendered files)."""
+        odds = None if self.odds is None else (self.odds.teams, self.odds.probs.tobytes())
+        return (self.league, self.year, self.teams, tuple(self.tickets.tolist()), tuple(self.order.tolist()),
+                self.combos, self.format.key(), odds, self.listed)
+
+
+def read_ceremony_csv(path, league=None, year=None, fmt=None, teams=None):
+    """
+    CeremonyReports of a drawn_combos CSV export, one per ceremony in it.
+
+    A file may hold several ceremonies, each starting again at Pick 1;
+    their reports are named '<league> (ceremony k)'. Tickets missing from
+    the export (no or blank Original_Tickets) come from `teams` or the
+    paired assignment CSV, as in the audit (export_teams), and so does the
+    listing order that breaks seed ties; without either, teams are in pick
+    order and tied teams share a seed (listed=False). league defaults to
+    the file name, or the folder name for files called drawn_combos*.csv.
+    """
+    known = export_teams(path, teams)
+    ceremonies = []
+    with open(path, encoding="utf-8", newline="") as fh:
+        for row in csv.DictReader(fh):
+            if row.get("Pick") == "Pick":
+                continue  # repeated header line of concatenated exports
+            if row.get("Pick") == "1" or not ceremonies:
+                ceremonies.append([])
+            ceremonies[-1].append(row)
+    if not ceremonies:
+        raise ValueError(f"{path}: no picks found.")
+    if league is None:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        league = os.path.basename(os.path.dirname(os.path.abspath(path))) if stem.startswith("drawn_combos") else stem
+    reports = []
+    for k, rows in enumerate(ceremonies, start=1):
+        name = f"{league} (ceremony {k})" if len(ceremonies) > 1 else league
+        reports.append(_ceremony_report(path, rows, known, name, year, fmt))
+    return reports
+
+
+def _ceremony_report(path, rows, known, league, year, fmt):
+    tickets_of, picked, combos = {}, [], []
+    for row in rows:
+        team = row["Team"].strip()
+        tickets = (row.get("Original_Tickets") or "").strip()
+        if tickets:
+            tickets = int(float(tickets))
+        elif known is not None and team in known:
+            tickets = known[team]
+        else:
+            raise ValueError(f"{path}: no tickets for {team!r} (no Original_Tickets column or value); give the teams "
+                             f"(--teams) or keep the assignment CSV exported with it next to it.")
+        tickets_of.setdefault(team, tickets)
+        picked.append(team)
+        combos.append(row["Combination"].strip())
+    if known is not None:
+        # listing order (and teams still to pick) from the teams table, the export's own tickets first
+        listing = {team: tickets_of.get(team, tickets) for team, tickets in known.items()}
+        listing.update((team, tickets) for team, tickets in tickets_of.items() if team not in listing)
+    else:
+        listing = tickets_of
+    index = {team: i for i, team in enumerate(listing)}
+    return CeremonyReport(listing, [index[team] for team in picked], combos, league=league, year=year, fmt=fmt,
+                          listed=known is not None)
+
+
+def read_ceremonies(paths, year=None, fmt=None, teams=None):
+    """CeremonyReports of drawn_combos CSV exports, or of every drawn_combos*.csv below the given directories."""
+    return [report for path in _expand(paths, "drawn_combos")
+            for report in read_ceremony_csv(path, year=year, fmt=fmt, teams=teams)]
+
+
+def report_csvs(report):
+    """{file name: bytes} of the CSV bundle: draft order, drawn combinations and pre-draw odds."""
+    rows = report.rows()
+    files = {"draft_order.csv": _csv_bytes(rows, [name for name, _, _ in ORDER_COLUMNS]),
+             "drawn_combos.csv": _csv_bytes(
+                 [{"Combination": r["Combination"], "Team": r["Team"], "Original_Tickets": r["Tickets"],
+                   "Pick": r["Pick"]} for r in rows], ["Combination", "Team", "Original_Tickets", "Pick"])}
+    if report.odds is not None:
+        files["odds.csv"] = report.odds.csv()
+    return files
+
+
+def _csv_bytes(rows, header):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, header, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows({k: "" if v is None else v for k, v in row.items()} for row in rows)
+    return out.getvalue().encode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def _fonts(font_path=None):
+    """(regular, bold) font names; a TTF file (for names outside Latin-1) is registered once per process."""
+    if not font_path:
+        return "Helvetica", "Helvetica-Bold"
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    name = "Lottery-" + re.sub(r"\W", "", os.path.splitext(os.path.basename(font_path))[0])
+    pdfmetrics.registerFont(TTFont(name, font_path))
+    return name, name
+
+
+@functools.lru_cache(maxsize=64)
+def _odds_layout(page_width, n_picks, margin=36, name_width=110):
+    """x of the team column and of every pick column, and the font size that fits them."""
+    step = (page_width - 2 * margin - name_width) / max(1, n_picks)
+    return margin, tuple(margin + name_width + step * (i + 1) for i in range(n_picks)), min(8.0, step / 3.2)
+
+
+def _fit(text, font, size, width):
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    text = str(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "…", font, size) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+@metrics.timed("report.pdf")
+def report_pdf(report, font_path=None):
+    """PDF bytes of a report: the draft order with movement and odds, then the pre-draw odds table."""
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+
+    font_path = font_path or os.environ.get(FONT_ENV) or None
+    regular, bold = _fonts(font_path)
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4, invariant=True)  # invariant: same report, same bytes
+    c.setTitle(f"{report.title} - Draft Lottery")
+
+    # header and footer are identical on every page: draw them once, reuse the form
+    for name, size in (("portrait", A4), ("landscape", landscape(A4))):
+        w, h = size
+        c.beginForm(name, lowerx=0, lowery=0, upperx=w, uppery=h)
+        c.setFont(bold, 15)
+        c.drawString(36, h - 46, _fit(f"{report.title} - Draft Lottery", bold, 15, w - 72))
+        c.setFont(regular, 8)
+        c.drawString(36, h - 60, f"Format: {report.format.describe()} · {len(report.teams)} teams · "
+                                 f"{int(report.tickets.sum()):,} tickets")
+        c.line(36, h - 66, w - 36, h - 66)
+        c.line(36, 40, w - 36, 40)
+        c.drawString(36, 28, "Fantasy Draft Lottery report")
+        c.endForm()
+
+    page = [0]
+
+    def new_page(size, form, heading):
+        if page[0]:
+            c.showPage()
+        page[0] += 1
+        c.setPageSize(size)
+        c.doForm(form)
+        c.setFont(regular, 8)
+        c.drawRightString(size[0] - 36, 28, f"Page {page[0]}")
+        c.setFont(bold, 11)
+        c.drawString(36, size[1] - 86, heading)
+        return size[1] - 106
+
+    # draft order
+    w, h = A4
+    rows = report.rows()
+
+    def order_header(y):
+        x = 36
+        c.setFont(bold, 8)
+        for name, width, right in ORDER_COLUMNS:
+            c.drawRightString(x + width - 4, y, name) if right else c.drawString(x, y, name)
+            x += width
+        c.line(36, y - 4, w - 36, y - 4)
+        return y - 16
+
+    y = order_header(new_page(A4, "portrait", "Draft order"))
+    for row in rows:
+        if y < 56:
+            y = order_header(new_page(A4, "portrait", "Draft order (continued)"))
+        move = row["Move"]
+        cells = {**row, "Move": f"+{move}" if move > 0 else str(move),
+                 "Pre-draw %": "" if row["Pre-draw %"] is None else f"{row['Pre-draw %']:.2f}"}
+        x = 36
+        for name, width, right in ORDER_COLUMNS:
+            c.setFont(bold if name == "Team" else regular, 8)
+            text = _fit(cells[name], bold if name == "Team" else regular, 8, width - 6)
+            c.drawRightString(x + width - 4, y, text) if right else c.drawString(x, y, text)
+            x += width
+        y -= 14
+    if y < 76 and (len(rows) < len(report.teams) or report.shared_seeds):
+        y = new_page(A4, "portrait", "Draft order (continued)")
+    c.setFont(regular, 8)
+    if len(rows) < len(report.teams):
+        y -= 4
+        c.drawString(36, y, f"{len(report.teams) - len(rows)} pick(s) still to be made.")
+        y -= 12
+    if report.shared_seeds:
+        c.drawString(36, y - 4, "Teams with equal tickets share a seed: the export does not say in which order "
+                                "they were listed.")
+
+    # pre-draw odds, picks across (landscape), the pick each team got highlighted
+    if report.odds is not None:
+        odds = report.odds
+        size = landscape(A4)
+        x0, xs, font_size = _odds_layout(size[0], odds.picks)
+        got = {report.teams[t]: pick for pick, t in enumerate(report.order.tolist(), start=1)}
+        seeds = report.seeds()
+        teams = sorted(odds.teams, key=lambda t: seeds[report.teams.index(t)] if t in report.teams else 0)
+
+        def odds_header(y):
+            c.setFont(bold, font_size)
+            c.drawString(x0, y, "Team (seed)")
+            for pick, x in enumerate(xs, start=1):
+                c.drawRightString(x - 2, y, str(pick))
+            c.line(x0, y - 4, size[0] - 36, y - 4)
+            return y - 14
+
+        heading = f"Pre-draw odds by pick (%, {odds.engine or 'computed'})"
+        y = odds_header(new_page(size, "landscape", heading))
+        step = xs[1] - xs[0] if len(xs) > 1 else xs[0] - x0
+        for team in teams:
+            if y < 56:
+                y = odds_header(new_page(size, "landscape", heading + " (continued)"))
+            i = odds.teams.index(team)
+            seed = int(seeds[report.teams.index(team)]) if team in report.teams else None
+            c.setFont(regular, font_size)
+            c.drawString(x0, y, _fit(f"{team} ({seed})", regular, font_size, xs[0] - x0 - step - 4))
+            for pick, x in enumerate(xs, start=1):
+                if got.get(team) == pick:
+                    c.setFillGray(0.85)
+                    c.rect(x - step + 1, y - 3, step - 2, font_size + 4, stroke=0, fill=1)
+                    c.setFillGray(0)
+                    c.setFont(bold, font_size)
+                else:
+                    c.setFont(regular, font_size)
+                c.drawRightString(x - 2, y, f"{odds.probs[i, pick - 1] * 100:.2f}")
+            y -= font_size + 6
+    c.save()
+    return buf.getvalue()
+
+
+def _slug(text, taken):
+    base = re.sub(r"[^\w.-]+", "_", text).strip("_") or "league"
+    slug, n = base, 2
+    while slug in taken:
+        slug, n = f"{base}-{n}", n + 1
+    taken.add(slug)
+    return slug
+
+
+def _render(report, pdf, csvs, font_path):
+    """[(file name, bytes)] of one league's report."""
+    files = []
+    if pdf:
+        files.append(("report.pdf", report_pdf(report, font_path)))
+    if csvs:
+        files += list(report_csvs(report).items())
+    return files
+
+
+def _render_to_dir(report, directory, pdf, csvs, font_path):
+    """Render straight into `directory` (one worker's share of a directory batch); returns the paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, data in _render(report, pdf, csvs, font_path):
+        paths.append(os.path.join(directory, name))
+        with open(paths[-1], "wb") as fh:
+            fh.write(data)
+    return paths
+
+
+def fill_odds(reports, n_simulations=100_000, seed=None, cache=None):
+    """Compute the missing pre-draw odds, once per distinct ticket configuration and format."""
+    done = {}
+    for report in reports:
+        if report.odds is not None:
+            continue
+        teams_dict = dict(zip(report.teams, report.tickets.tolist()))
+        key = (tuple(teams_dict.items()), report.format.key())
+        if key not in done:
+            n = len(teams_dict)
+            engine = choose_odds_engine(n, n, report.format)
+            teams, probs, half_width, _ = odds_matrix(teams_dict, engine, n_simulations=n_simulations, seed=seed,
+                                                      cache=cache, fmt=report.format)
+            done[key] = OddsTable(teams, probs, half_width, engine)
+        report.odds = done[key]
+    return reports
+
+
+def _in_order(pool, fn, *iterables, window=1):
+    """map(fn, *iterables) on a process pool with at most `window` calls submitted and not yet consumed."""
+    pending = collections.deque()
+    for args in zip(*iterables):
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
+def write_reports(reports, out, workers=1, pdf=True, csvs=True, font_path=None, n_simulations=100_000, seed=None,
+                  cache=None, progress=None):
+    """
+    Render every report and stream the files to `out`; returns the written names.
+
+    out is a directory (one sub-folder per league), a path ending in .zip,
+    or a writable binary file object that receives a zip stream (it need
+    not be seekable). Missing pre-draw odds are computed first (fill_odds,
+    with the given cache). With workers > 1 leagues are rendered in that
+    many processes: into their folders directly, or handed back in order
+    and appended to the zip as they finish. No more than `workers` leagues
+    are submitted ahead of the one being written, so at most that many
+    rendered results wait in memory. progress(done, total) follows each
+    league.
+    """
+    reports = fill_odds(list(reports), n_simulations=n_simulations, seed=seed, cache=cache)
+    taken = set()
+    slugs = [_slug(report.title, taken) for report in reports]
+    workers = max(1, min(int(workers), len(reports) or 1, default_workers() * 4))
+    to_dir = isinstance(out, (str, os.PathLike)) and not str(out).lower().endswith(".zip")
+    pool = None
+    if workers > 1:
+        import multiprocessing as mp
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn (not fork): the Streamlit server is multi-threaded
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+    names = []
+    try:
+        if to_dir:
+            dirs = [os.path.join(out, slug) for slug in slugs]
+            args = (reports, dirs, [pdf] * len(reports), [csvs] * len(reports), [font_path] * len(reports))
+            results = _in_order(pool, _render_to_dir, *args, window=workers) if pool else map(_render_to_dir, *args)
+            for done, paths in enumerate(results, start=1):
+                names += paths
+                if progress is not None:
+                    progress(done, len(reports))
+            return names
+        args = (reports, [pdf] * len(reports), [csvs] * len(reports), [font_path] * len(reports))
+        results = _in_order(pool, _render, *args, window=workers) if pool else map(_render, *args)
+        with zipfile.ZipFile(out, "w") as archive:
+            for done, (slug, files) in enumerate(zip(slugs, results), start=1):
+                for name, data in files:
+                    # PDF pages are compressed already; CSVs shrink a lot
+                    compression = zipfile.ZIP_STORED if name.endswith(".pdf") else zipfile.ZIP_DEFLATED
+                    archive.writestr(f"{slug}/{name}", data, compress_type=compression)
+                    names.append(f"{slug}/{name}")
+                if progress is not None:
+                    progress(done, len(reports))
+        return names
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
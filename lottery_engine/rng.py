@@ -0,0 +1,38 @@
+# lottery_engine/rng.py
+"""
+Explicit random streams for the engine.
+
+Nothing in the package touches a global random state: callers own a
+Generator (one per app session, one per job) or a seed, and chunked
+simulations derive their streams from the seed by jumping, so chunk i
+gets the same numbers whichever worker or round runs it.
+"""
+import numpy as np
+
+
+def new_seed():
+    """Fresh 128-bit seed from OS entropy; store it to replay a run."""
+    return int(np.random.SeedSequence().entropy)
+
+
+def make_rng(seed=None):
+    """Generator for a seed (None = fresh entropy); an existing Generator is returned as is."""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.Generator(np.random.PCG64(seed))
+
+
+def chunk_rng(seed, index):
+    """
+    Generator for chunk `index` of the stream of `seed`.
+
+    PCG64 jumps ahead by index * ~2^127 draws in O(log) time, so chunks
+    never overlap and any chunk can be produced on its own, in any
+    process, in any order.
+    """
+    return np.random.Generator(np.random.PCG64(seed).jumped(index))
+
+
+def derive_seed(rng):
+    """Seed for a sub-task (assignment, job, ...) drawn from an owner's Generator."""
+    return int(rng.integers(0, 2 ** 63))